@@ -1,18 +1,32 @@
-from typing import Literal
+import os
+import html
+import time
+import httpx
+from pydantic import ValidationError
+from typing import Literal, get_args
 from langgraph.graph import END
-from langgraph.types import Command
-from langgraph.prebuilt import create_react_agent
-from langchain_core.messages import HumanMessage
+from langgraph.types import Command, Send
+from langgraph.prebuilt import ToolNode, create_react_agent
+from langchain_core.messages import AIMessage, HumanMessage
 from app.agent.tools import *
 from app.agent.llm_setup import llm
-from app.agent.router import Router, State
+from app.agent.rendering import expert_result_failed, render_expert_result, render_tool_result
+from app.agent.tool_cache import is_error
+from app.agent.fast_router import FAST_ROUTER_ENABLED, classify, has_constraints, router_stats
+from app.agent.history import budget_hook, compact, within_budget
+from app.agent.router import ARGS_FIELDS, Expert, Plan, Router, State
 
-async def supervisor(state: State) -> Command[Literal["hotel_search_expert", "weather_expert", "place_search_expert", "flight_fares_search_expert", "__end__"]]:
-    """
-    The supervisor routes tasks to the appropriate expert based on the user message context.
-    It uses an LLM with structured output to decide which agent to call next.
-    """
-    system_prompt = f"""
+EXPERTS = get_args(Expert)
+
+# "direct": when the router supplied tool arguments, the expert calls its tool without an LLM turn
+# and falls back to its react agent otherwise. "react": always use the react agents.
+EXPERT_MODE = os.getenv("EXPERT_MODE", "direct")
+
+expert_stats = {"direct": 0, "react": 0, "direct_fallbacks": 0}
+
+# Prompts, structured-output runnables and expert react agents are built once at import
+# and shared by every request; nodes only invoke them.
+SUPERVISOR_PROMPT = f"""
     You are a Supervisor Agent coordinating a travel assistant system with the following expert agents:
     {', '.join([
         'hotel_search_expert',
@@ -46,144 +60,275 @@ async def supervisor(state: State) -> Command[Literal["hotel_search_expert", "we
     - A short explanation of why that agent is needed
     - Input hints or parameters for the agent
     - The word FINISH if the user's request has been fully satisfied
+    - When you pick an agent and one tool call with fully known values answers its part of the query,
+      also fill in that agent's tool arguments (hotel_args, weather_args, place_args or flight_args)
     
     
     User Query:
     """
 
-    messages = [{"role": "system", "content": system_prompt}] + state["messages"]
+PLANNER_PROMPT = f"""
+    You are a Planner coordinating a travel assistant system with the following expert agents:
+    {', '.join(EXPERTS)}
+
+    Each agent performs a specific task:
+    - hotel_search_expert: Finds real-time hotels using a given location, travel dates, and optional filters (e.g., star rating)
+    - weather_expert: Returns current weather for a given city
+    - place_search_expert: Suggests attractions, restaurants, and cultural spots near a location
+    - flight_fares_search_expert: Finds flights and fares between two IATA codes on a specific date
+
+    Your responsibilities:
+    1. Carefully analyze the user's message to understand the full intent.
+    2. Return the complete list of expert agents needed to answer it. They will all run in parallel.
+    3. Include each agent at most once, and only agents that are actually relevant to the query.
+    4. Do not hallucinate — never include an agent that isn't relevant or make assumptions about the user's intent.
+    5. Return an empty list if no agent is relevant.
+    6. For each selected agent, also fill in its tool arguments (hotel_args, weather_args, place_args, flight_args)
+       when one tool call answers its part of the query and every required value is stated or clearly implied.
+       Leave them empty otherwise; the agent will work them out itself.
+    """
+
+supervisor_llm = llm.with_structured_output(Router)
+planner_llm = llm.with_structured_output(Plan)
+
+
+def _tool_args(response):
+    """Expert name -> tool arguments from a router's structured output (empty values dropped)."""
+    tool_args = {}
+    for field, expert in ARGS_FIELDS.items():
+        args = response.get(field)
+        if args:
+            tool_args[expert] = {k: v for k, v in args.items() if v not in (None, "")}
+    return tool_args
+
+
+def _args_from_params(expert, params):
+    """Tool arguments from fast-router parameters, when they are complete enough for a direct call."""
+    if expert == "flight_fares_search_expert" and {"from_code", "to_code", "date"} <= params.keys():
+        return {k: params[k] for k in ("from_code", "to_code", "date")}
+    if expert == "weather_expert" and "city" in params:
+        return {"city": params["city"]}
+    if expert == "hotel_search_expert" and "city" in params:
+        # One date is the check-in ("hotels in Goa tomorrow"); the tool makes it a one-night stay
+        dates = {k: params[k] for k in ("arrival_date", "departure_date") if k in params}
+        if not dates and "date" in params:
+            dates = {"arrival_date": params["date"]}
+        return {"location": params["city"], **dates}
+    return None
+
+
+UNAVAILABLE = "Sorry, this search is not available right now ({e}). Please try again shortly."
+
+
+def _expert_message(name, content, failed):
+    # Flagged outputs (a tool error shown to the user) keep the answer out of the response cache
+    kwargs = {"error": True} if failed else {}
+    return {"messages": [HumanMessage(content=content, name=name, additional_kwargs=kwargs)]}
+
+
+async def run_expert(name, tool, react_agent, state):
+    """
+    Run one expert. With router-supplied arguments the tool is called directly (no LLM call);
+    otherwise, or if the direct call fails, the expert's react agent picks the arguments.
+    """
+    args = (state.get("tool_args") or {}).get(name) if EXPERT_MODE == "direct" else None
+    if args:
+        try:
+            data = await tool.ainvoke(args)
+        except ValidationError:
+            # Arguments the tool does not accept: let the react agent work them out
+            expert_stats["direct_fallbacks"] += 1
+        except httpx.HTTPError as e:
+            # The upstream failed (timeout, open circuit...): an LLM turn would only call it again
+            expert_stats["direct"] += 1
+            return _expert_message(name, f"<p>{html.escape(UNAVAILABLE.format(e=e))}</p>", True)
+        else:
+            expert_stats["direct"] += 1
+            return _expert_message(name, render_tool_result(tool.name, data), is_error(data))
+
+    expert_stats["react"] += 1
+    result = await react_agent.ainvoke(state)
+    return _expert_message(name, render_expert_result(result["messages"]), expert_result_failed(result["messages"]))
+
+
+async def supervisor(state: State) -> Command[Literal["hotel_search_expert", "weather_expert", "place_search_expert", "flight_fares_search_expert", "__end__"]]:
+    """
+    The supervisor routes tasks to the appropriate expert based on the user message context.
+    It uses an LLM with structured output to decide which agent to call next.
+    """
+    # The fast-path router already dispatched the only expert this query needs
+    if state.get("next", "").startswith("fast:"):
+        return Command(goto=END, update={"next": END})
+
+    messages = [{"role": "system", "content": SUPERVISOR_PROMPT}] + within_budget(state["messages"])
     
-    llm_with_structure_output = llm.with_structured_output(Router)
-    response = await llm_with_structure_output.ainvoke(messages)
+    started = time.perf_counter()
+    response = await supervisor_llm.ainvoke(messages)
+    router_stats.record_llm(time.perf_counter() - started)
     
     goto = response["next"]
     
     if goto == "FINISH":
         goto = END
         
-    return Command(goto=goto, update={"next": goto})
+    return Command(goto=goto, update={"next": goto, "tool_args": _tool_args(response)})
+
+
+def _upstream_error(e: httpx.HTTPError) -> str:
+    # ToolNode handles the exception types in this annotation and re-raises anything else
+    return UNAVAILABLE.format(e=e)
+
+
+def _return_direct(tool):
+    """
+    Stop the react loop after the tool runs: its result is rendered server-side, not re-written by the LLM.
+    An upstream failure becomes an error result (shown as is) instead of failing the whole job.
+    """
+    return ToolNode([tool.model_copy(update={"return_direct": True})], handle_tool_errors=_upstream_error)
 
 
-async def hotel_search_agent(state: State) -> Command[Literal["supervisor"]]:
+hotel_react_agent = create_react_agent(
+    llm,
+    tools=_return_direct(get_hotels_by_area_and_radius),
+    pre_model_hook=budget_hook,
+    prompt="""
+        You are a hotel search expert. Call the hotel search tool with the location, dates and filters
+        from the user's request. The tool result is shown to the user as is, so do not summarize it.
+
+        If the user does not mention check-in and check-out dates, assume:
+        - arrival_date = today's date
+        - departure_date = tomorrow's date
+    """
+)
+
+
+async def hotel_search_agent(state: State) -> dict:
     """
     The hotel expert uses the hotel-related tools to find hotels based on location, star rating, and dates.
     """
-    agent = create_react_agent(
-        llm, 
-        tools=[get_hotels_by_area_and_radius], 
-        prompt="""
-            You are a hotel search expert. 
-            For each hotel, return the following fields in HTML format:
-
-            - name
-            - star_rating
-            - review_score
-            - review_word
-            - review_count
-            - address
-            - city
-            - district
-            - latitude
-            - longitude
-            - price_per_night
-            - currency
-            - image
-            - booking_url
-            - is_free_cancellable
-            - is_mobile_deal
-            - checkin_from
-            - checkout_until
-            - arrival_date
-            - departure_date
-            - distance_km
-            
-            If the user does not mention check-in and check-out dates, assume:
-            - arrival_date = today's date
-            - departure_date = tomorrow's date
-            
-            `latitude` and `longitude` must always be included.
-            Do not return bbox, display_name, or type in the final output. Just output a clean HTML <ul> list showing all above fields.
-        """
-    )
-    
-    result = await agent.ainvoke(state)
-    
-    return Command(update={"messages": [HumanMessage(content=result["messages"][-1].content, name="hotel_search_expert")]}, goto="supervisor")
+    return await run_expert("hotel_search_expert", get_hotels_by_area_and_radius, hotel_react_agent, state)
 
 
-async def weather_agent(state: State) -> Command[Literal["supervisor"]]:
-    agent = create_react_agent(
-        llm,
-        tools=[get_weather],
-        prompt="""
-            You are a weather expert. Use the weather tool to fetch real-time weather for the user's city.
+weather_react_agent = create_react_agent(
+    llm,
+    tools=_return_direct(get_weather),
+    pre_model_hook=budget_hook,
+    prompt="""
+        You are a weather expert. Call the weather tool for the user's city to fetch real-time weather.
+        The tool result is shown to the user as is, so do not summarize it.
+    """
+)
 
-            Return the result in clean HTML format using <ul>/<li> or <div>. Include:
 
-            - City and Country
-            - Description (e.g., clear sky, light rain)
-            - Temperature (actual, feels like, min, max)
-            - Humidity, Pressure
-            - Wind speed and direction
-            - Visibility (in meters), Cloud Coverage (%)
-            - Sunrise and Sunset in UTC
-            - Latitude and Longitude (always include)
-            - Optional: weather icon <img> if available
-            
-            `latitude` and `longitude` must always be included.
-            Do not use JSON or plain text. Only output valid, well-structured HTML.
-            """
+async def weather_agent(state: State) -> dict:
+    return await run_expert("weather_expert", get_weather, weather_react_agent, state)
 
 
+place_react_agent = create_react_agent(
+    llm,
+    tools=_return_direct(get_places),
+    pre_model_hook=budget_hook,
+    prompt="""
+        You are an expert in finding attractions, restaurants, and cultural places.
+        Call the get_places tool with the city and the kind of place the user is looking for.
+        The tool result is shown to the user as is, so do not summarize it.
+    """
 )
-        
-    result = await agent.ainvoke(state)
-    
-    return Command(update={"messages": [HumanMessage(content=result["messages"][-1].content, name="weather_expert")]}, goto="supervisor")
-
-async def place_search_agent(state: State) -> Command[Literal["supervisor"]]:
-    agent = create_react_agent(
-            llm,
-            tools=[get_places],
-            prompt="""
-                You are an expert in finding attractions, restaurants, and cultural places.
-
-                Use the get_places tool to return the top 5 places.
-
-                For each result, include:
-                - Name
-                - Category (e.g., museum, restaurant)
-                - Address
-                - Latitude and Longitude (always include)
-                - Phone (if available)
-                - Website (as a clickable link)
-                
-                `latitude` and `longitude` must always be included.
-                Return the output in clean HTML format using <ul>/<li> or <div>. No JSON or plain text. Keep it structured and readable.
-        """
 
 
-    )
-    result = await agent.ainvoke(state)
-    return Command(update={"messages": [HumanMessage(content=result["messages"][-1].content, name="place_search_expert")]}, goto="supervisor")
+async def place_search_agent(state: State) -> dict:
+    return await run_expert("place_search_expert", get_places, place_react_agent, state)
 
-async def flight_fares_search_agent(state: State) -> Command[Literal["supervisor"]]:
-    agent = create_react_agent(
-            llm,
-            tools=[get_flight_fares],
-            prompt="""
-                You are a flight search expert. Use the flight API to return flight fares and details.
 
-                For each result, include:
-                - From and To airport codes
-                - Departure and Arrival time
-                - Airline and number of Stops
-                - Fare with currency
+flight_fares_react_agent = create_react_agent(
+    llm,
+    tools=_return_direct(get_flight_fares),
+    pre_model_hook=budget_hook,
+    prompt="""
+        You are a flight search expert. Call the flight fare tool with the departure and arrival
+        airports and the travel date (YYYY-MM-DD) from the user's request. Pass IATA codes if the user
+        gave them, otherwise the city names as written: the tool resolves cities to airports itself.
+        The tool result is shown to the user as is, so do not summarize it.
+    """
+)
+
 
-                Respond in HTML format using <ul>/<li> or <div>. Avoid JSON or plain text.
-                """
+async def flight_fares_search_agent(state: State) -> dict:
+    return await run_expert("flight_fares_search_expert", get_flight_fares, flight_fares_react_agent, state)
 
 
+async def planner(state: State) -> Command[Literal["hotel_search_expert", "weather_expert", "place_search_expert", "flight_fares_search_expert", "__end__"]]:
+    """
+    Planning-mode supervisor: picks every expert the query needs in a single structured-output call
+    and dispatches them in parallel. Their outputs are combined by `join_results`.
+    """
+    messages = [{"role": "system", "content": PLANNER_PROMPT}] + within_budget(state["messages"])
+
+    started = time.perf_counter()
+    response = await planner_llm.ainvoke(messages)
+    router_stats.record_llm(time.perf_counter() - started)
+
+    experts = [e for e in dict.fromkeys(response["experts"]) if e in EXPERTS]
+
+    if not experts:
+        return Command(goto=END, update={"next": "FINISH"})
+
+    tool_args = _tool_args(response)
+    return Command(
+        goto=[Send(e, {**state, "tool_args": tool_args}) for e in experts],
+        update={"next": ",".join(experts), "tool_args": tool_args}
     )
-    result = await agent.ainvoke(state)
-    return Command(update={"messages": [HumanMessage(content=result["messages"][-1].content, name="flight_fares_search_expert")]}, goto="supervisor")
\ No newline at end of file
+
+
+async def join_results(state: State) -> dict:
+    """
+    Combines the outputs of the experts that ran in parallel for the latest user message
+    into a single response message.
+    """
+    outputs = []
+    for message in reversed(state["messages"]):
+        if message.name not in EXPERTS:
+            break
+        outputs.append(message)
+
+    if len(outputs) < 2:
+        return {}
+
+    # Keep the order in which the planner listed the experts
+    order = {name: i for i, name in enumerate(state.get("next", "").split(","))}
+    outputs.sort(key=lambda m: order.get(m.name, len(order)))
+    failed = any(m.additional_kwargs.get("error") for m in outputs)
+    return {"messages": [AIMessage(content="\n".join(m.content for m in outputs), name="travel_planner",
+                                   additional_kwargs={"error": True} if failed else {})]}
+
+
+
+async def compact_history(state: State) -> dict:
+    """
+    Runs first on every turn of a checkpointed thread: drops turns beyond HISTORY_MAX_TURNS and
+    shrinks earlier expert outputs to short plain-text summaries, so the state stays bounded.
+    """
+    updates = compact(state["messages"], EXPERTS)
+    return {"messages": updates} if updates else {}
+
+
+def make_fast_router(fallback):
+    """
+    Deterministic pre-router in front of the LLM router (`fallback`: "planner" or "supervisor").
+    Clearly single-intent queries go straight to their expert with the extracted parameters;
+    anything ambiguous falls back to the LLM.
+    """
+    async def fast_router(state: State) -> Command:
+        route = classify(state["messages"][-1].content) if FAST_ROUTER_ENABLED else None
+        if route is None:
+            # Clear the previous turn's routing so the LLM router starts fresh on this one
+            return Command(goto=fallback, update={"next": fallback, "params": {}, "tool_args": {}})
+
+        expert, params = route
+        router_stats.fast_routed += 1
+        message = state["messages"][-1].content
+        args = None if has_constraints(expert, message, params) else _args_from_params(expert, params)
+        tool_args = {expert: args} if args else {}
+        return Command(goto=expert, update={"next": f"fast:{expert}", "params": params, "tool_args": tool_args})
+
+    return fast_router
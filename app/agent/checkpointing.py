@@ -0,0 +1,131 @@
+import os
+import time
+import asyncio
+from langgraph.checkpoint.memory import MemorySaver
+
+
+# "sqlite" (default): conversations persist in CHECKPOINT_DB across restarts and are shared by workers.
+# "memory": per process, lost on restart. "none": every message starts a new conversation.
+CHECKPOINTER = os.getenv("CHECKPOINTER", "sqlite")
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", "checkpoints.db")
+# Root checkpoints kept per thread; older ones (and their pending writes) are deleted after each turn
+CHECKPOINT_KEEP = int(os.getenv("CHECKPOINT_KEEP", "20"))
+# Threads with no turn for this many seconds are deleted (0: kept forever), checked at most every
+# CHECKPOINT_SWEEP_INTERVAL seconds. Without it every new conversation stays in CHECKPOINT_DB for good.
+CHECKPOINT_TTL = float(os.getenv("CHECKPOINT_TTL", "86400"))
+CHECKPOINT_SWEEP_INTERVAL = float(os.getenv("CHECKPOINT_SWEEP_INTERVAL", "600"))
+
+_attach_lock = None
+# Last turn per thread for the in-memory checkpointer (the SQLite one keeps it in a table)
+_activity = {}
+_last_sweep = time.time()
+
+
+def compile_checkpointer():
+    """Checkpointer to compile the graph with. The SQLite one needs a running loop, see `ensure_checkpointer`."""
+    return MemorySaver() if CHECKPOINTER == "memory" else None
+
+
+async def ensure_checkpointer(graph):
+    """Attach the SQLite checkpointer to the compiled graph, once per event loop."""
+    global _attach_lock
+    if CHECKPOINTER != "sqlite":
+        return
+    loop = asyncio.get_running_loop()
+    if graph.checkpointer is not None and getattr(graph.checkpointer, "loop", loop) is loop:
+        return
+
+    _attach_lock = _attach_lock or asyncio.Lock()
+    async with _attach_lock:
+        if graph.checkpointer is not None and getattr(graph.checkpointer, "loop", loop) is loop:
+            return
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+        saver = AsyncSqliteSaver(await aiosqlite.connect(CHECKPOINT_DB))
+        await saver.setup()
+        await saver.conn.execute("CREATE TABLE IF NOT EXISTS thread_activity (thread_id TEXT PRIMARY KEY, updated REAL)")
+        # Threads from before activity was tracked expire CHECKPOINT_TTL from now
+        await saver.conn.execute("INSERT OR IGNORE INTO thread_activity SELECT DISTINCT thread_id, ? FROM checkpoints", (time.time(),))
+        await saver.conn.commit()
+        graph.checkpointer = saver
+
+
+async def close_checkpointer(graph):
+    conn = getattr(graph.checkpointer, "conn", None)
+    if conn is not None:
+        await conn.close()
+        graph.checkpointer = None
+
+
+async def prune_thread(graph, thread_id, keep=CHECKPOINT_KEEP):
+    """Delete all but the newest `keep` root checkpoints of a thread (checkpoint ids sort by time)."""
+    saver = graph.checkpointer
+    conn = getattr(saver, "conn", None)
+    if conn is None or keep <= 0:
+        return
+    async with saver.lock:
+        async with conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '' "
+            "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?", (thread_id, keep - 1)
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return
+        await conn.execute("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id < ?", (thread_id, row[0]))
+        await conn.execute("DELETE FROM writes WHERE thread_id = ? AND checkpoint_id < ?", (thread_id, row[0]))
+        await conn.commit()
+
+
+async def touch_thread(graph, thread_id):
+    """Record a turn on the thread (its idle time starts over) and delete idle threads when a sweep is due."""
+    saver = graph.checkpointer
+    if saver is None:
+        return
+    now = time.time()
+    conn = getattr(saver, "conn", None)
+    if conn is not None:
+        async with saver.lock:
+            await conn.execute("INSERT OR REPLACE INTO thread_activity VALUES (?, ?)", (thread_id, now))
+            await conn.commit()
+    else:
+        _activity[thread_id] = now
+    if CHECKPOINT_TTL > 0 and now - _last_sweep > CHECKPOINT_SWEEP_INTERVAL:
+        await sweep_idle_threads(graph)
+
+
+async def sweep_idle_threads(graph, ttl=None):
+    """Delete threads idle for more than `ttl` seconds (default CHECKPOINT_TTL). Returns how many."""
+    global _last_sweep
+    _last_sweep = time.time()
+    saver = graph.checkpointer
+    cutoff = _last_sweep - (CHECKPOINT_TTL if ttl is None else ttl)
+    conn = getattr(saver, "conn", None)
+    if conn is not None:
+        idle = "SELECT thread_id FROM thread_activity WHERE updated < ?"
+        async with saver.lock:
+            async with conn.execute(f"SELECT COUNT(*) FROM ({idle})", (cutoff,)) as cursor:
+                (count,) = await cursor.fetchone()
+            await conn.execute(f"DELETE FROM checkpoints WHERE thread_id IN ({idle})", (cutoff,))
+            await conn.execute(f"DELETE FROM writes WHERE thread_id IN ({idle})", (cutoff,))
+            await conn.execute("DELETE FROM thread_activity WHERE updated < ?", (cutoff,))
+            await conn.commit()
+        return count
+    idle = [thread_id for thread_id, updated in _activity.items() if updated < cutoff]
+    for thread_id in idle:
+        await delete_thread(graph, thread_id)
+    return len(idle)
+
+
+async def delete_thread(graph, thread_id):
+    """Delete a thread's checkpoints (e.g. a one-off batch query nobody will follow up on)."""
+    saver = graph.checkpointer
+    if saver is None:
+        return
+    await saver.adelete_thread(thread_id)
+    _activity.pop(thread_id, None)
+    conn = getattr(saver, "conn", None)
+    if conn is not None:
+        async with saver.lock:
+            await conn.execute("DELETE FROM thread_activity WHERE thread_id = ?", (thread_id,))
+            await conn.commit()
@@ -0,0 +1,158 @@
+import os
+import re
+from datetime import date, timedelta
+from app.agent.gazetteer import GAZETTEER_ENABLED, gazetteer, normalize_name
+
+
+# Keyword classifier: each intent scores the number of distinct cue patterns found in the query
+INTENT_CUES = {
+    "weather_expert": [r"\bweather\b", r"\btemperature\b", r"\bforecast\b", r"\brain(ing|y)?\b", r"\bhumid(ity)?\b",
+                       r"\bsunny\b", r"\bcold\b", r"\bhot outside\b", r"\bwind(y)?\b"],
+    "hotel_search_expert": [r"\bhotels?\b", r"\bstay\b", r"\baccommodations?\b", r"\brooms?\b", r"\bhostels?\b",
+                            r"\bresorts?\b", r"\blodging\b", r"\bcheck[- ]?in\b", r"\bstar\b"],
+    "flight_fares_search_expert": [r"\bflights?\b", r"\bfly(ing)?\b", r"\bair ?fares?\b", r"\bfares?\b", r"\bairlines?\b",
+                                   r"\btickets?\b", r"\bplanes?\b"],
+    "place_search_expert": [r"\battractions?\b", r"\bthings to do\b", r"\brestaurants?\b", r"\bmuseums?\b", r"\bsightseeing\b",
+                            r"\bplaces? to (visit|see|eat)\b", r"\bcafes?\b", r"\bparks?\b", r"\blandmarks?\b", r"\bvisit\b"],
+}
+
+# Multi-part or conversational cues: leave these to the LLM router
+AMBIGUOUS_CUES = [r"\band (also|then)\b", r"\bplan\b", r"\bitinerary\b", r"\bcompare\b", r"\bwhich is better\b"]
+
+# Constraints extract_params does not read, per expert: a query with any of these still gets the fast
+# route, but its expert picks the tool arguments itself (react agent) rather than a direct call dropping them
+GUESTS = r"\b(adults?|guests?|people|persons?|passengers?|pax|travell?ers?)\b"
+CHILDREN = r"\b(child|children|kids?|infants?)\b"
+# Dates other than ISO ones and today / tonight / tomorrow: weekdays, months, "next weekend", "5th", "12/11"
+DATES = [r"\b(mon|tues|wednes|thurs|fri|satur|sun)days?\b", r"\bweek(end)?s?\b", r"\b(next|this|coming)\b",
+         r"\bday after\b", r"\b(jan(uary)?|feb(ruary)?|mar(ch)?|apr(il)?|may|june?|july?|aug(ust)?|sept?(ember)?|oct(ober)?|nov(ember)?|dec(ember)?)\b",
+         r"\b\d{1,2}(st|nd|rd|th)\b", r"\b\d{1,2}[/.]\d{1,2}\b", r"\bin \d+ days?\b"]
+CONSTRAINT_CUES = {
+    "hotel_search_expert": [r"\bstars?\b", r"\d\s*-?\s*star", GUESTS, CHILDREN, r"\brooms?\b", r"\bnights?\b",
+                            r"\b(until|till|through)\b", r"\b(usd|inr|eur|gbp|rupees?|euros?|dollars?|pounds?)\b",
+                            r"[$€£₹]", r"\bbusiness\b", *DATES],
+    "flight_fares_search_expert": [GUESTS, CHILDREN, r"\b(business|first|premium|economy|cabin)\b", *DATES],
+}
+# Two places named in one query ("Goa and Mumbai", "Paris, London or Rome"): one direct call would cover only one
+SEVERAL_PLACES = re.compile(r"\b[A-Z][\w'.-]*\s*(?:,\s*)?(?:\band\b|\bor\b|&|\bvs\.?)\s+[A-Z]")
+
+IATA_PAIR = re.compile(r"\b([A-Z]{3})\b\s*(?:to|-|→|->)\s*\b([A-Z]{3})\b")
+# "from Kolkata to New Delhi": capitalized words on both sides of "to", checked against the gazetteer
+CITY_PAIR = re.compile(r"\b([A-Z][\w'.-]*(?:\s+[A-Z][\w'.-]*)*)\s+(?i:to)\s+([A-Z][\w'.-]*(?:\s+[A-Z][\w'.-]*)*)")
+ISO_DATE = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+CITY = re.compile(r"\b(?:in|at|for|near|around)\s+([A-Z][\w'.-]*(?:[ ,]+[A-Z][\w'.-]*)*)")
+TODAY = re.compile(r"\b(today|tonight)\b", re.I)
+# "tomorrow" but not "day after tomorrow" (left unparsed: the expert works that date out)
+TOMORROW = re.compile(r"(?<!\bafter )\btomorrow\b", re.I)
+# Capitalized words after "for"/"in" that are dates, not places ("for Friday", "in December")
+DATE_WORDS = {"monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday", "january", "february",
+              "march", "april", "may", "june", "july", "august", "september", "october", "november", "december",
+              "today", "tonight", "tomorrow"}
+
+
+def _airport(words):
+    """IATA code for a known airport code or city (exact name only, no guessing), else None."""
+    name = " ".join(words)
+    if name.upper() in gazetteer.airports:
+        return name.upper()
+    return gazetteer.iata(name) if gazetteer.city(name, fuzzy=False) else None
+
+
+def _city_pair(message):
+    """(from, to) IATA codes for "<city> to <city>", trying the longest known names next to "to"."""
+    for match in CITY_PAIR.finditer(message):
+        before, after = match.group(1).split(), match.group(2).split()
+        origin = next(filter(None, (_airport(before[i:]) for i in range(len(before)))), None)
+        destination = next(filter(None, (_airport(after[:i]) for i in range(len(after), 0, -1))), None)
+        if origin and destination and origin != destination:
+            return origin, destination
+    return None
+
+
+def extract_params(message):
+    """Parameters that can be read off the query without an LLM: IATA codes (or known cities), dates, a city."""
+    params = {}
+    pair = IATA_PAIR.search(message) or (GAZETTEER_ENABLED and _city_pair(message))
+    if pair:
+        params["from_code"], params["to_code"] = pair if isinstance(pair, tuple) else pair.groups()
+    dates = ISO_DATE.findall(message)
+    if not dates and TOMORROW.search(message):
+        dates = [(date.today() + timedelta(days=1)).isoformat()]
+    elif not dates and TODAY.search(message):
+        dates = [date.today().isoformat()]
+    if dates:
+        params["date"] = dates[0]
+    if len(dates) > 1:
+        params["arrival_date"], params["departure_date"] = dates[0], dates[1]
+    # The name may end a sentence ("weather in Paris."): keep inner dots (St. Louis), drop trailing ones
+    places = {m.group(1).rstrip(" ,.'-") for m in CITY.finditer(message)}
+    places = {p for p in places if p.lower() not in DATE_WORDS}
+    # Several place phrases ("near MG Road in Bangalore"): which one to search is not clear, leave it to the expert
+    if len(places) == 1:
+        params["city"] = places.pop()
+    return params
+
+
+def has_constraints(expert, message, params):
+    """
+    True unless extract_params accounted for the whole query for `expert`: it states constraints
+    (stars, guests, rooms, cabin class, dates other than ISO / today / tomorrow...) or names several places.
+    """
+    lowered = message.lower()
+    if any(re.search(cue, lowered) for cue in CONSTRAINT_CUES.get(expert, [])):
+        return True
+    if SEVERAL_PLACES.search(message):
+        return True
+    # "Paris, London" is two cities, "Kolkata, India" one (a hotel area such as "Koramangala, Bangalore" is fine too)
+    city = params.get("city", "")
+    return expert == "weather_expert" and any(normalize_name(part) not in gazetteer.countries for part in city.split(",")[1:])
+
+
+def classify(message):
+    """
+    Return (expert, params) when the query clearly has a single intent, else None
+    (ambiguous, multi-intent or no intent: the LLM router decides).
+    """
+    lowered = message.lower()
+    if any(re.search(cue, lowered) for cue in AMBIGUOUS_CUES):
+        return None
+
+    scores = {intent: sum(1 for cue in cues if re.search(cue, lowered)) for intent, cues in INTENT_CUES.items()}
+    params = extract_params(message)
+    # Two IATA codes are a strong flight signal even without the word "flight"
+    if "from_code" in params:
+        scores["flight_fares_search_expert"] += 2
+
+    matched = [intent for intent, score in scores.items() if score > 0]
+    if len(matched) != 1:
+        return None
+    return matched[0], params
+
+
+class RouterStats:
+    """How often the fast path avoided an LLM routing call, and the latency that saved."""
+
+    def __init__(self):
+        self.fast_routed = 0
+        self.llm_routed = 0
+        self.llm_seconds = 0.0
+
+    def record_llm(self, seconds):
+        self.llm_routed += 1
+        self.llm_seconds += seconds
+
+    def stats(self):
+        total = self.fast_routed + self.llm_routed
+        avg_llm = self.llm_seconds / self.llm_routed if self.llm_routed else None
+        return {
+            "fast_routed": self.fast_routed,
+            "llm_routed": self.llm_routed,
+            "llm_calls_avoided_ratio": self.fast_routed / total if total else None,
+            "avg_llm_router_seconds": avg_llm,
+            "estimated_seconds_saved": self.fast_routed * avg_llm if avg_llm is not None else None,
+        }
+
+
+router_stats = RouterStats()
+
+FAST_ROUTER_ENABLED = os.getenv("FAST_ROUTER_ENABLED", "1") == "1"
@@ -0,0 +1,153 @@
+import os
+import re
+import csv
+import math
+import bisect
+import difflib
+import unicodedata
+
+
+GAZETTEER_ENABLED = os.getenv("GAZETTEER_ENABLED", "1").lower() not in ("0", "false", "no")
+# A city without an airport of its own flies from the nearest one within this distance
+GAZETTEER_AIRPORT_RADIUS_KM = float(os.getenv("GAZETTEER_AIRPORT_RADIUS_KM", "150"))
+# difflib similarity a misspelt city name needs to be accepted (0-1)
+GAZETTEER_FUZZY_CUTOFF = float(os.getenv("GAZETTEER_FUZZY_CUTOFF", "0.85"))
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+
+def normalize_name(text):
+    """Lookup key for a place name: accents stripped, case-folded, punctuation and extra spaces removed."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    text = re.sub(r"[^\w\s]", " ", text.casefold())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi, d_lambda = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+class Gazetteer:
+    """
+    Offline index of the bundled airports and cities (app/agent/data), so common cities resolve to
+    IATA codes and coordinates without an LLM guess or a LocationIQ call.
+
+    Names (and aliases, e.g. Bangalore / Bengaluru) are kept as sorted normalized keys: exact and
+    prefix lookups are a binary search, and fuzzy matching only compares keys that share the query's
+    first letter. A few hundred rows, so nearest-airport lookups simply scan all airports.
+    """
+
+    def __init__(self, airports, cities):
+        self.airports = {a["iata"]: a for a in airports}
+        self.cities = {}
+        for city in cities:
+            # Airports in file order: the first one listed for a city is its main airport
+            city["airports"] = [a["iata"] for a in airports if a["city"] == city["name"]]
+            for name in [city["name"], *city["aliases"]]:
+                self.cities.setdefault(normalize_name(name), city)
+        self.keys = sorted(self.cities)
+        self.countries = {normalize_name(c[field]) for c in cities for field in ("country", "country_code")}
+        self.counters = {"lookups": 0, "exact": 0, "fuzzy": 0, "misses": 0}
+
+    def complete(self, prefix, limit=10):
+        """Cities whose name or alias starts with `prefix`, in name order."""
+        key = normalize_name(prefix)
+        start = bisect.bisect_left(self.keys, key)
+        found = []
+        for name in self.keys[start:]:
+            if not name.startswith(key) or len(found) >= limit:
+                break
+            if self.cities[name] not in found:
+                found.append(self.cities[name])
+        return found
+
+    def city(self, name, fuzzy=True):
+        """
+        The city `name` refers to, or None. Accepts a trailing country ("Kolkata, India"); anything
+        else after a comma (a state, a district) is not a city-level query and is left to the geocoder.
+        """
+        self.counters["lookups"] += 1
+        head, *rest = [normalize_name(part) for part in name.split(",")]
+        if any(part not in self.countries for part in rest):
+            self.counters["misses"] += 1
+            return None
+
+        city = self.cities.get(head)
+        if city is not None:
+            self.counters["exact"] += 1
+        elif fuzzy and head:
+            candidates = self.keys[bisect.bisect_left(self.keys, head[0]):bisect.bisect_left(self.keys, chr(ord(head[0]) + 1))]
+            match = difflib.get_close_matches(head, candidates, n=1, cutoff=GAZETTEER_FUZZY_CUTOFF)
+            city = self.cities[match[0]] if match else None
+            if city is not None:
+                self.counters["fuzzy"] += 1
+
+        if city is None or rest and not {normalize_name(city["country"]), normalize_name(city["country_code"])} & set(rest):
+            self.counters["misses"] += 1
+            return None
+        return city
+
+    def nearest_airports(self, lat, lon, k=1, max_km=None):
+        """[(airport, distance_km)] of the `k` airports closest to (lat, lon), optionally within `max_km`."""
+        distances = sorted((haversine_km(lat, lon, a["latitude"], a["longitude"]), code) for code, a in self.airports.items())
+        return [(self.airports[code], round(km, 1)) for km, code in distances[:k] if max_km is None or km <= max_km]
+
+    def iata(self, text):
+        """
+        IATA code for an airport code or a city name: the code itself if it is a known airport, else
+        the city's main airport, or the airport nearest to it (GAZETTEER_AIRPORT_RADIUS_KM). An
+        unknown three-letter code is passed through as is. None if nothing matches.
+        """
+        text = text.strip()
+        code = len(text) == 3 and text.isalpha()
+        # "CCU" or "ccu" is the airport; "Goa" is the city, even though GOA is an airport code elsewhere
+        if code and text.upper() in self.airports and (text.isupper() or normalize_name(text) not in self.cities):
+            return text.upper()
+        city = self.city(text, fuzzy=not code)
+        if city is not None:
+            if city["airports"]:
+                return city["airports"][0]
+            nearest = self.nearest_airports(city["latitude"], city["longitude"], max_km=GAZETTEER_AIRPORT_RADIUS_KM)
+            return nearest[0][0]["iata"] if nearest else None
+        return text.upper() if code else None
+
+    def geocode(self, place):
+        """A known city as a LocationIQ-style result list (lat, lon, boundingbox), or None."""
+        city = self.city(place)
+        if city is None:
+            return None
+        lat, lon, radius = city["latitude"], city["longitude"], city["radius_km"]
+        d_lat = radius / KM_PER_DEGREE
+        d_lon = radius / (KM_PER_DEGREE * max(0.01, math.cos(math.radians(lat))))
+        return [{
+            "lat": str(lat),
+            "lon": str(lon),
+            "display_name": f"{city['name']}, {city['country']}",
+            "boundingbox": [str(round(lat - d_lat, 6)), str(round(lat + d_lat, 6)),
+                            str(round(lon - d_lon, 6)), str(round(lon + d_lon, 6))],
+            "class": "place",
+            "type": "city",
+            "source": "gazetteer",
+        }]
+
+    def stats(self):
+        return {**self.counters, "airports": len(self.airports), "names": len(self.keys)}
+
+
+def load_gazetteer(data_dir=DATA_DIR):
+    with open(os.path.join(data_dir, "airports.csv"), encoding="utf-8") as f:
+        airports = [{**row, "latitude": float(row["latitude"]), "longitude": float(row["longitude"])}
+                    for row in csv.DictReader(f)]
+    with open(os.path.join(data_dir, "cities.csv"), encoding="utf-8") as f:
+        cities = [{**row, "latitude": float(row["latitude"]), "longitude": float(row["longitude"]),
+                   "radius_km": float(row["radius_km"]), "aliases": [a for a in row["aliases"].split("|") if a]}
+                  for row in csv.DictReader(f)]
+    return Gazetteer(airports, cities)
+
+
+gazetteer = load_gazetteer()
@@ -0,0 +1,151 @@
+import os
+import math
+import time
+import numpy as np
+from collections import defaultdict
+
+
+EARTH_RADIUS_KM = 6371
+
+
+def haversine_many(lat, lon, lats, lons):
+    """Great-circle distance (km) from one point to many points, vectorized with NumPy."""
+    lats = np.radians(np.asarray(lats, dtype=float))
+    lons = np.radians(np.asarray(lons, dtype=float))
+    phi = math.radians(lat)
+    d_phi = lats - phi
+    d_lambda = lons - math.radians(lon)
+    a = np.sin(d_phi / 2) ** 2 + math.cos(phi) * np.cos(lats) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest(distances, k):
+    """Indices of the `k` smallest distances, closest first (argpartition, then sort only those k)."""
+    distances = np.asarray(distances)
+    if k >= len(distances):
+        return np.argsort(distances, kind="stable")
+    candidates = np.argpartition(distances, k)[:k]
+    return candidates[np.argsort(distances[candidates], kind="stable")]
+
+
+class HotelGridIndex:
+    """
+    In-memory grid index over hotels already fetched from Booking, so "hotels within N km of a point"
+    can be answered locally when that area was searched before.
+
+    Hotels are partitioned by search signature (dates, guests, currency, filters: everything that
+    changes which hotels and prices Booking returns). A query is only answered from the index when
+    its area lies inside a bbox that was fetched for the same signature and has not expired. Only
+    add bboxes that were fetched exhaustively (every page up to a short one): a bbox known from its
+    first page or two would answer sub-area queries with a small, popularity-ordered subset.
+    """
+
+    def __init__(self, cell_deg=0.05, ttl=300):
+        self.cell_deg = cell_deg
+        self.ttl = ttl
+        self.cells = defaultdict(dict)
+        self.coverage = defaultdict(list)
+        self.counters = {"hits": 0, "misses": 0}
+        self.last_purge = time.time()
+
+    def _cell(self, signature, lat, lon):
+        return signature, int(lat // self.cell_deg), int(lon // self.cell_deg)
+
+    def add(self, signature, bbox, hotels):
+        """Index `hotels` (dicts with hotel_id, latitude, longitude) fetched for `bbox` = (min_lat, max_lat, min_lon, max_lon)."""
+        now = time.time()
+        if now - self.last_purge > self.ttl:
+            self._purge(now)
+        expires_at = now + self.ttl
+        self.coverage[signature].append((bbox, expires_at))
+        for hotel in hotels:
+            key = hotel.get("hotel_id")
+            if key is None:
+                key = (hotel["latitude"], hotel["longitude"], hotel.get("name"))
+            self.cells[self._cell(signature, hotel["latitude"], hotel["longitude"])][key] = (hotel, expires_at)
+
+    def _purge(self, now):
+        for cell_key in list(self.cells):
+            cell = {k: v for k, v in self.cells[cell_key].items() if v[1] > now}
+            if cell:
+                self.cells[cell_key] = cell
+            else:
+                del self.cells[cell_key]
+        for signature in list(self.coverage):
+            live = [(bbox, exp) for bbox, exp in self.coverage[signature] if exp > now]
+            if live:
+                self.coverage[signature] = live
+            else:
+                del self.coverage[signature]
+        self.last_purge = now
+
+    @staticmethod
+    def _circle_bbox(lat, lon, radius_km):
+        d_lat = radius_km / 111.0
+        d_lon = radius_km / (111.0 * max(math.cos(math.radians(lat)), 0.01))
+        return lat - d_lat, lat + d_lat, lon - d_lon, lon + d_lon
+
+    def _covered(self, signature, bbox):
+        min_lat, max_lat, min_lon, max_lon = bbox
+        now = time.time()
+        live = [(covered, exp) for covered, exp in self.coverage.get(signature, []) if exp > now]
+        self.coverage[signature] = live
+        return any(
+            c_min_lat <= min_lat and max_lat <= c_max_lat and c_min_lon <= min_lon and max_lon <= c_max_lon
+            for (c_min_lat, c_max_lat, c_min_lon, c_max_lon), _ in live
+        )
+
+    def _candidates(self, signature, bbox):
+        """Live hotels in the cells overlapping `bbox` (a superset of the hotels inside it)."""
+        min_lat, max_lat, min_lon, max_lon = bbox
+        now = time.time()
+        candidates = []
+        for i in range(int(min_lat // self.cell_deg), int(max_lat // self.cell_deg) + 1):
+            for j in range(int(min_lon // self.cell_deg), int(max_lon // self.cell_deg) + 1):
+                cell = self.cells.get((signature, i, j))
+                if cell:
+                    candidates.extend(hotel for hotel, exp in cell.values() if exp > now)
+        return candidates
+
+    def _closest(self, lat, lon, candidates, keep, k):
+        """Candidates passing `keep(distances)`, closest to (lat, lon) first, with distance_km."""
+        if not candidates:
+            return []
+        distances = haversine_many(lat, lon, [h["latitude"] for h in candidates], [h["longitude"] for h in candidates])
+        inside = np.flatnonzero(keep(distances))
+        order = inside[nearest(distances[inside], k or len(inside))]
+        return [{**candidates[i], "distance_km": round(float(distances[i]), 2)} for i in order]
+
+    def within(self, signature, lat, lon, radius_km, k=None):
+        """Hotels within `radius_km` of (lat, lon), closest first, or None if the area is not covered."""
+        bbox = self._circle_bbox(lat, lon, radius_km)
+        if not self._covered(signature, bbox):
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        return self._closest(lat, lon, self._candidates(signature, bbox), lambda d: d <= radius_km, k)
+
+    def in_bbox(self, signature, bbox, k=None):
+        """
+        Hotels inside `bbox` = (min_lat, max_lat, min_lon, max_lon), closest to its center first (what a
+        Booking search of that bbox returns), or None if the bbox is not covered.
+        """
+        if not self._covered(signature, bbox):
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        min_lat, max_lat, min_lon, max_lon = bbox
+        candidates = [h for h in self._candidates(signature, bbox)
+                      if min_lat <= h["latitude"] <= max_lat and min_lon <= h["longitude"] <= max_lon]
+        return self._closest((min_lat + max_lat) / 2, (min_lon + max_lon) / 2, candidates, lambda d: d >= 0, k)
+
+    def stats(self):
+        return {**self.counters, "hotels": sum(len(c) for c in self.cells.values()), "cells": len(self.cells)}
+
+
+hotel_index = HotelGridIndex(
+    cell_deg=float(os.getenv("HOTEL_INDEX_CELL_DEG", "0.05")),
+    ttl=float(os.getenv("HOTEL_INDEX_TTL", "300")),
+)
+
+HOTEL_INDEX_ENABLED = os.getenv("HOTEL_INDEX_ENABLED", "0") == "1"
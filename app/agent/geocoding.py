@@ -0,0 +1,185 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import asyncio
+import httpx
+from collections import OrderedDict
+from app.agent.http_clients import http_clients
+from app.agent.telemetry import record_cache
+from app.agent.resilience import hedged
+from app.agent.gazetteer import GAZETTEER_ENABLED, gazetteer
+from app.agent.tool_cache import shared_calls
+
+
+LOCATIONIQ_URL = "https://us1.locationiq.com/v1/search.php"
+
+
+class GeocodeUnavailable(Exception):
+    """LocationIQ did not answer (timeout, outage, rate limit): unlike "not found", nothing to cache or share."""
+
+
+def normalize_query(place):
+    """Cache key for a geocoding query: case-folded with whitespace and commas collapsed."""
+    place = re.sub(r"\s*,\s*", ", ", place.strip().casefold())
+    return re.sub(r"\s+", " ", place)
+
+
+class SQLiteGeocodeStore:
+    """Optional on-disk tier so geocoding results survive restarts."""
+
+    def __init__(self, path):
+        self.path = path
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS geocode (key TEXT PRIMARY KEY, data TEXT, expires_at REAL)")
+
+    def get(self, key):
+        with sqlite3.connect(self.path) as conn:
+            row = conn.execute("SELECT data, expires_at FROM geocode WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, data, expires_at):
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("INSERT OR REPLACE INTO geocode VALUES (?, ?, ?)", (key, json.dumps(data), expires_at))
+
+
+class Geocoder:
+    """
+    Single geocoding layer in front of LocationIQ.
+
+    Cities in the bundled gazetteer are answered locally, without a LocationIQ call. The full LocationIQ response is cached per normalized query in a bounded LRU with TTL,
+    optionally backed by SQLite. Concurrent lookups of the same query share one upstream call.
+    With `hedge_after` set, a lookup still unanswered after that many seconds is sent again and
+    the first answer wins (LocationIQ latency has a long tail).
+    """
+
+    def __init__(self, max_size=1024, ttl=86400, negative_ttl=3600, db_path=None, hedge_after=0.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hedge_after = hedge_after
+        self.store = SQLiteGeocodeStore(db_path) if db_path else None
+        self.cache = OrderedDict()
+        self.in_flight = {}
+        self.counters = {"local": 0, "hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "upstream_errors": 0, "hedged": 0}
+
+    def _get_memory(self, key):
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        if entry[1] < time.time():
+            del self.cache[key]
+            return None
+        self.cache.move_to_end(key)
+        return entry
+
+    def _set_memory(self, key, data, expires_at):
+        self.cache[key] = (data, expires_at)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+    async def _fetch(self, key, place):
+        if self.store:
+            entry = await asyncio.to_thread(self.store.get, key)
+            if entry is not None:
+                self.counters["disk_hits"] += 1
+                record_cache("geocode", True)
+                self._set_memory(key, *entry)
+                return entry[0]
+
+        self.counters["misses"] += 1
+        record_cache("geocode", False)
+        params = {"key": os.getenv("GEOLOCATION_IQ_API_KEY"), "q": place, "format": "json"}
+        client = http_clients.get("locationiq")
+        attempts = 0
+
+        async def call():
+            nonlocal attempts
+            attempts += 1
+            return await client.get(LOCATIONIQ_URL, params=params)
+
+        try:
+            if self.hedge_after:
+                res = await hedged(call, self.hedge_after, accept=lambda r: r.status_code < 500)
+            else:
+                res = await call()
+        except httpx.HTTPError as e:
+            # Timed out, retried out or circuit open: not cached, and search answers None for now
+            self.counters["upstream_errors"] += 1
+            raise GeocodeUnavailable(str(e)) from e
+        finally:
+            self.counters["hedged"] += max(0, attempts - 1)
+
+        # LocationIQ answers 404 "Unable to geocode" for unknown places; cache that briefly.
+        # Anything else that is not a result list (rate limits, outages) is not cached.
+        if res.status_code == 404:
+            data, ttl = None, self.negative_ttl
+        elif res.status_code == 200 and isinstance(res.json(), list):
+            data, ttl = res.json() or None, self.ttl
+        else:
+            self.counters["upstream_errors"] += 1
+            raise GeocodeUnavailable(f"LocationIQ answered {res.status_code}")
+
+        expires_at = time.time() + ttl
+        self._set_memory(key, data, expires_at)
+        if self.store:
+            await asyncio.to_thread(self.store.set, key, data, expires_at)
+        return data
+
+    async def search(self, place):
+        """Return the raw LocationIQ result list for `place`, or None if it cannot be geocoded."""
+        local = gazetteer.geocode(place) if GAZETTEER_ENABLED else None
+        if local is not None:
+            self.counters["local"] += 1
+            return local
+
+        key = normalize_query(place)
+        shared = shared_calls.get()
+        try:
+            if shared is not None:
+                # A failed lookup raises inside the shared call, so the batch's next lookup retries it
+                return await shared.call(f"geocode:{key}", lambda: self._search(key, place))
+            return await self._search(key, place)
+        except GeocodeUnavailable:
+            return None
+
+    async def _search(self, key, place):
+        entry = self._get_memory(key)
+        if entry is not None:
+            self.counters["hits"] += 1
+            record_cache("geocode", True)
+            return entry[0]
+
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(task)
+
+        # Shielded so a cancelled caller does not cancel the lookup other callers are waiting on
+        task = asyncio.ensure_future(self._fetch(key, place))
+        self.in_flight[key] = task
+        task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def coordinates(self, place):
+        """Return (lat, lon) of the best match for `place`, or None."""
+        data = await self.search(place)
+        if not data:
+            return None
+        return float(data[0]["lat"]), float(data[0]["lon"])
+
+    def stats(self):
+        return {**self.counters, "size": len(self.cache), "max_size": self.max_size, "in_flight": len(self.in_flight)}
+
+
+geocoder = Geocoder(
+    max_size=int(os.getenv("GEOCODE_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("GEOCODE_CACHE_TTL", "86400")),
+    negative_ttl=float(os.getenv("GEOCODE_NEGATIVE_TTL", "3600")),
+    db_path=os.getenv("GEOCODE_CACHE_DB") or None,
+    hedge_after=float(os.getenv("GEOCODE_HEDGE_AFTER", "0")),
+)
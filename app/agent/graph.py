@@ -1,22 +1,45 @@
+import os
 from langgraph.graph import StateGraph, START, END
-# from langgraph.checkpoint.memory import MemorySaver
 from app.agent.router import State
 from app.agent.agent import *
+from app.agent.checkpointing import compile_checkpointer
+
+# "plan": one planner call, experts run in parallel, outputs joined (latency ~ max(expert)).
+# "serial": supervisor -> expert -> supervisor loop (latency ~ sum(expert)).
+GRAPH_MODE = os.getenv("GRAPH_MODE", "plan")
 
 graph = StateGraph(State)
 
-graph.add_node("supervisor", supervisor)
 graph.add_node("hotel_search_expert", hotel_search_agent)
 graph.add_node("weather_expert", weather_agent)
 graph.add_node("place_search_expert", place_search_agent)
 graph.add_node("flight_fares_search_expert", flight_fares_search_agent)
 
-graph.add_edge(START, "supervisor")
-graph.add_edge("hotel_search_expert", "supervisor")
-graph.add_edge("weather_expert", "supervisor")
-graph.add_edge("place_search_expert", "supervisor")
-graph.add_edge("flight_fares_search_expert", "supervisor")
-graph.add_edge("supervisor", END)
+# Earlier turns of the thread are compacted before routing; obvious single-intent queries
+# then skip the LLM router entirely
+graph.add_node("compact_history", compact_history)
+graph.add_edge(START, "compact_history")
+graph.add_edge("compact_history", "fast_router")
+
+if GRAPH_MODE == "serial":
+    graph.add_node("fast_router", make_fast_router("supervisor"), destinations=(*EXPERTS, "supervisor"))
+    graph.add_node("supervisor", supervisor)
+
+    graph.add_edge("hotel_search_expert", "supervisor")
+    graph.add_edge("weather_expert", "supervisor")
+    graph.add_edge("place_search_expert", "supervisor")
+    graph.add_edge("flight_fares_search_expert", "supervisor")
+    graph.add_edge("supervisor", END)
+else:
+    graph.add_node("fast_router", make_fast_router("planner"), destinations=(*EXPERTS, "planner"))
+    graph.add_node("planner", planner)
+    graph.add_node("join_results", join_results)
+
+    graph.add_edge("hotel_search_expert", "join_results")
+    graph.add_edge("weather_expert", "join_results")
+    graph.add_edge("place_search_expert", "join_results")
+    graph.add_edge("flight_fares_search_expert", "join_results")
+    graph.add_edge("join_results", END)
 
-# memory = MemorySaver()
-app = graph.compile()
+# Conversations are checkpointed per thread_id (CHECKPOINTER: sqlite, memory or none)
+app = graph.compile(checkpointer=compile_checkpointer())
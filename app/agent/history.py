@@ -0,0 +1,80 @@
+import os
+import re
+import html
+from langchain_core.messages import HumanMessage, RemoveMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately, trim_messages
+
+
+# Earlier turns kept in a thread's state, and the size their expert outputs are cut down to
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "10"))
+HISTORY_SUMMARY_CHARS = int(os.getenv("HISTORY_SUMMARY_CHARS", "800"))
+# Token budget for the conversation part of one LLM call (router, planner or expert)
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "4000"))
+
+# Messages that carry rendered results: the experts' outputs and the planner's joined answer
+JOINED_OUTPUT = "travel_planner"
+
+
+def html_to_text(content):
+    """Rendered expert HTML as plain text: enough for the LLM to refer back to, a fraction of the tokens."""
+    text = re.sub(r"<(br|/p|/li|/tr|/h\d|/div)\s*/?>", "\n", content, flags=re.I)
+    text = html.unescape(re.sub(r"<[^>]+>", " ", text))
+    text = re.sub(r"[ \t]+", " ", text)
+    return re.sub(r"\s*\n\s*", "\n", text).strip()
+
+
+def split_turns(messages):
+    """Messages grouped by turn; a turn starts at each message from the user (unnamed HumanMessage)."""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) and not message.name or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def compact(messages, experts, max_turns=HISTORY_MAX_TURNS, summary_chars=HISTORY_SUMMARY_CHARS):
+    """
+    State updates (for the add_messages reducer) that bound a thread's history before a new turn:
+    turns beyond `max_turns` are removed; in the remaining earlier turns, expert outputs already
+    contained in the joined answer are removed and the rest are replaced, under the same id, by a
+    plain-text summary of at most `summary_chars`. The current turn is left alone.
+    """
+    turns = split_turns(messages)[:-1]
+    updates = [RemoveMessage(id=m.id) for turn in turns[:-max_turns or None] for m in turn] if len(turns) > max_turns else []
+
+    for turn in turns[-max_turns:] if max_turns else []:
+        joined = any(m.name == JOINED_OUTPUT for m in turn)
+        for message in turn:
+            if message.name not in experts and message.name != JOINED_OUTPUT:
+                continue
+            if joined and message.name in experts:
+                updates.append(RemoveMessage(id=message.id))
+                continue
+            if message.additional_kwargs.get("compacted"):
+                continue
+            text = html_to_text(message.content)
+            if len(text) > summary_chars:
+                text = text[:summary_chars].rstrip() + " …"
+            updates.append(message.model_copy(update={"content": text, "additional_kwargs": {**message.additional_kwargs, "compacted": True}}))
+    return updates
+
+
+def within_budget(messages, max_tokens=LLM_CONTEXT_TOKENS):
+    """
+    The most recent messages that fit in `max_tokens` (system prompt kept, starting on a user
+    message). The latest user message is always kept, even if it alone is over budget.
+    """
+    trimmed = trim_messages(messages, max_tokens=max_tokens, token_counter=count_tokens_approximately,
+                            strategy="last", start_on="human", include_system=True, allow_partial=False)
+    if any(isinstance(m, HumanMessage) for m in trimmed):
+        return trimmed
+    system = [m for m in messages[:1] if isinstance(m, SystemMessage)]
+    latest = next((i for i in range(len(messages) - 1, -1, -1)
+                   if isinstance(messages[i], HumanMessage) and not messages[i].name), len(messages) - 1)
+    return system + messages[latest:]
+
+
+def budget_hook(state):
+    """pre_model_hook for the expert react agents: trims what the model sees, not the state."""
+    return {"llm_input_messages": within_budget(state["messages"])}
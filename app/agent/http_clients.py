@@ -0,0 +1,170 @@
+import os
+import importlib.util
+import time
+import asyncio
+import httpx
+from app.agent.telemetry import record_http
+from app.agent.resilience import CircuitBreaker, ResilientTransport
+from app.agent.rate_limit import rate_limiter
+
+
+# One pooled client per upstream API. Limits can be overridden per upstream with
+# HTTP_MAX_CONNECTIONS_<NAME> / HTTP_MAX_KEEPALIVE_<NAME>, e.g. HTTP_MAX_CONNECTIONS_LOCATIONIQ=4.
+# `timeout` is the deadline of one attempt and `retries` the extra attempts on connection errors,
+# timeouts, 429 and 5xx (HTTP_ATTEMPT_TIMEOUT_<NAME> / HTTP_RETRIES_<NAME>).
+# `rate` / `burst` are the client-side token bucket per API key, in requests per second
+# (RATE_LIMIT_<NAME> / RATE_BURST_<NAME>; RATE_LIMIT_<NAME>=0 disables it). Defaults follow the free tiers.
+# `origin` is where `warm` opens a connection at startup.
+UPSTREAMS = {
+    "locationiq": {"max_connections": 10, "max_keepalive": 5, "timeout": 5.0, "retries": 2, "rate": 2.0, "burst": 2,
+                   "origin": "https://us1.locationiq.com"},
+    "foursquare": {"max_connections": 20, "max_keepalive": 10, "timeout": 8.0, "retries": 2, "rate": 10.0, "burst": 10,
+                   "origin": "https://places-api.foursquare.com"},
+    "openweather": {"max_connections": 20, "max_keepalive": 10, "timeout": 5.0, "retries": 2, "rate": 1.0, "burst": 10,
+                    "origin": "https://api.openweathermap.org"},
+    "booking": {"max_connections": 20, "max_keepalive": 10, "timeout": 15.0, "retries": 1, "rate": 5.0, "burst": 5,
+                "origin": "https://apidojo-booking-v1.p.rapidapi.com"},
+    "flights": {"max_connections": 20, "max_keepalive": 10, "timeout": 20.0, "retries": 1, "rate": 2.0, "burst": 2,
+                "origin": "https://flight-fare-search.p.rapidapi.com"},
+}
+
+
+def _env_float(name, default):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _http2_enabled():
+    """HTTP/2 needs the optional `h2` package (pip install httpx[http2])."""
+    if os.getenv("HTTP2_ENABLED", "1").lower() in ("0", "false", "no"):
+        return False
+    return importlib.util.find_spec("h2") is not None
+
+
+class ClientRegistry:
+    """
+    Process-wide registry of pooled httpx.AsyncClient instances, one per upstream.
+
+    Clients are opened in the FastAPI lifespan (`start`) and closed on shutdown (`aclose`).
+    If a tool is used outside the app (e.g. from a notebook) the client is created lazily.
+    Setting `transport` (e.g. an httpx.MockTransport replaying fixtures) routes every client through it.
+    """
+
+    def __init__(self, upstreams, transport=None):
+        self.upstreams = upstreams
+        self.transport = transport
+        self.clients = {}
+        self.request_counts = {name: 0 for name in upstreams}
+
+    def _build(self, name):
+        cfg = self.upstreams[name]
+        suffix = name.upper()
+        limits = httpx.Limits(
+            max_connections=_env_int(f"HTTP_MAX_CONNECTIONS_{suffix}", cfg["max_connections"]),
+            max_keepalive_connections=_env_int(f"HTTP_MAX_KEEPALIVE_{suffix}", cfg["max_keepalive"]),
+            keepalive_expiry=_env_float("HTTP_KEEPALIVE_EXPIRY", 30.0),
+        )
+        timeout = httpx.Timeout(
+            _env_float("HTTP_TIMEOUT", 20.0),
+            connect=_env_float("HTTP_CONNECT_TIMEOUT", 5.0),
+            pool=_env_float("HTTP_POOL_TIMEOUT", 10.0),
+        )
+
+        async def count_request(request):
+            self.request_counts[name] += 1
+            request.extensions["started"] = time.perf_counter()
+
+        async def record_response(response):
+            # Every caller reads the body anyway; reading it here gives the byte count and full latency
+            await response.aread()
+            started = response.request.extensions.get("started", time.perf_counter())
+            record_http(response.request.url.host, response.status_code, len(response.content), time.perf_counter() - started)
+
+        inner = self.transport or httpx.AsyncHTTPTransport(limits=limits, http2=_http2_enabled())
+        transport = ResilientTransport(
+            name,
+            inner,
+            timeout=_env_float(f"HTTP_ATTEMPT_TIMEOUT_{suffix}", cfg["timeout"]),
+            retries=_env_int(f"HTTP_RETRIES_{suffix}", cfg["retries"]),
+            backoff_base=_env_float("HTTP_BACKOFF_BASE", 0.25),
+            backoff_max=_env_float("HTTP_BACKOFF_MAX", 4.0),
+            max_retry_after=_env_float("HTTP_MAX_RETRY_AFTER", 10.0),
+            breaker=CircuitBreaker(
+                name,
+                failure_threshold=_env_int(f"BREAKER_FAILURES_{suffix}", 5),
+                reset_after=_env_float(f"BREAKER_RESET_{suffix}", 30.0),
+            ),
+            limiter=rate_limiter,
+            rate=_env_float(f"RATE_LIMIT_{suffix}", cfg["rate"]),
+            burst=_env_int(f"RATE_BURST_{suffix}", cfg["burst"]),
+        )
+
+        return httpx.AsyncClient(
+            timeout=timeout,
+            transport=transport,
+            event_hooks={"request": [count_request], "response": [record_response]},
+        )
+
+    async def start(self):
+        for name in self.upstreams:
+            self.get(name)
+
+    async def warm(self, timeout=10.0):
+        """
+        Open one pooled connection per upstream (DNS, TCP, TLS) with a bare HEAD to its origin, so the
+        first real request skips the handshake. Sent below the retry/rate-limit layer and without an
+        API key: it uses no quota. Returns the status (or error) per upstream.
+        """
+        async def open_one(name):
+            transport = self.get(name)._transport
+            inner = getattr(transport, "inner", transport)
+            try:
+                response = await asyncio.wait_for(
+                    inner.handle_async_request(httpx.Request("HEAD", self.upstreams[name]["origin"])), timeout)
+                await response.aclose()
+                return name, response.status_code
+            except Exception as e:
+                return name, type(e).__name__
+
+        return dict(await asyncio.gather(*(open_one(name) for name in self.upstreams)))
+
+    def get(self, name):
+        client = self.clients.get(name)
+        if client is None or client.is_closed:
+            client = self._build(name)
+            self.clients[name] = client
+        return client
+
+    async def aclose(self):
+        for client in self.clients.values():
+            await client.aclose()
+        self.clients.clear()
+
+    def stats(self):
+        """Per-upstream pool statistics, used to size the connection limits."""
+        stats = {}
+        for name in self.upstreams:
+            client = self.clients.get(name)
+            entry = {"open": client is not None and not client.is_closed, "requests": self.request_counts[name]}
+            transport = getattr(client, "_transport", None)
+            if isinstance(transport, ResilientTransport):
+                entry["resilience"] = transport.stats()
+                transport = transport.inner
+            # httpx does not expose pool state publicly; read it from the httpcore pool when available
+            pool = getattr(transport, "_pool", None)
+            connections = getattr(pool, "connections", None)
+            if connections is not None:
+                entry["connections"] = len(connections)
+                entry["idle"] = sum(1 for c in connections if c.is_idle())
+                entry["active"] = entry["connections"] - entry["idle"]
+                entry["http2"] = sum(1 for c in connections if "HTTP/2" in repr(c))
+            stats[name] = entry
+        return stats
+
+
+http_clients = ClientRegistry(UPSTREAMS)
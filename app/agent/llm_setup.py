@@ -7,5 +7,10 @@ load_dotenv()
 llm = ChatOpenAI(
     model="gpt-4o-mini", 
     temperature=0.0,
+    # Report token usage on streamed calls too (the streaming endpoint streams every LLM call)
+    stream_usage=True,
+    # Bounded per call so one slow completion cannot hold a job past its deadline
+    timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
     api_key=os.getenv("OPENAI_API_KEY")
 )
\ No newline at end of file
@@ -0,0 +1,130 @@
+import os
+import re
+import json
+import heapq
+import functools
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _stops(value):
+    """'Direct' / 'Non-stop' -> 0, '1 Stop' -> 1."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    match = re.search(r"\d+", value)
+    if match:
+        return float(match.group())
+    return 0.0 if re.search(r"direct|non-?stop", value, re.I) else None
+
+
+def _duration_minutes(value):
+    """'2h 35m' -> 155."""
+    if not isinstance(value, str):
+        return _number(value)
+    hours = re.search(r"(\d+)\s*h", value)
+    minutes = re.search(r"(\d+)\s*m", value)
+    if not hours and not minutes:
+        return None
+    return int(hours.group(1) if hours else 0) * 60 + int(minutes.group(1) if minutes else 0)
+
+
+# Per tool: feature -> (extractor, weight). Negative weight = lower is better.
+SCORING = {
+    "get_hotels_by_area_and_radius": {
+        "distance_km": (lambda h: _number(h.get("distance_km")), -1.0),
+        "price": (lambda h: _number(h.get("price_per_night")), -0.3),
+        "review_score": (lambda h: _number(h.get("review_score")), 0.3),
+    },
+    "get_flight_fares": {
+        "price": (lambda f: _number(f.get("price")), -1.0),
+        "stops": (lambda f: _stops(f.get("stops")), -0.5),
+        "duration": (lambda f: _duration_minutes(f.get("duration")), -0.5),
+    },
+}
+
+TOP_K = {
+    "get_hotels_by_area_and_radius": int(os.getenv("HOTELS_TOP_K", "10")),
+    "get_flight_fares": int(os.getenv("FLIGHTS_TOP_K", "10")),
+}
+
+# Optional field projection, e.g. HOTELS_FIELDS="name,price_per_night,distance_km"
+FIELDS = {
+    "get_hotels_by_area_and_radius": os.getenv("HOTELS_FIELDS"),
+    "get_flight_fares": os.getenv("FLIGHTS_FIELDS"),
+}
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    """
+    The tokenizer, resolved once. tiktoken downloads the encoding file on first use, synchronously;
+    a failure is remembered too, so it is not retried (and the event loop blocked) on every call.
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(data):
+    """Approximate prompt tokens for a tool result as it is serialized into the LLM context."""
+    text = json.dumps(data, ensure_ascii=False)
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text))
+
+
+trim_stats = {}
+
+
+def score(tool_name, items):
+    """Weighted sum of min-max normalized features; missing values score as the worst."""
+    features = SCORING[tool_name]
+    scores = [0.0] * len(items)
+    for extract, weight in features.values():
+        values = [extract(item) for item in items]
+        present = [v for v in values if v is not None]
+        if not present:
+            continue
+        low, high = min(present), max(present)
+        span = (high - low) or 1.0
+        for i, v in enumerate(values):
+            normalized = (v - low) / span if v is not None else (1.0 if weight < 0 else 0.0)
+            scores[i] += weight * normalized
+    return scores
+
+
+def rank_and_trim(tool_name, items, top_k=None, fields=None):
+    """
+    Keep the `top_k` best items by score (best first) and project them onto `fields`, so the
+    size of what reaches the LLM context is bounded regardless of how much the upstream returned.
+    """
+    top_k = TOP_K[tool_name] if top_k is None else top_k
+    fields = fields or FIELDS[tool_name]
+    if isinstance(fields, str):
+        fields = [f.strip() for f in fields.split(",") if f.strip()]
+
+    tokens_in = count_tokens(items)
+    scores = score(tool_name, items)
+    # Partial selection: O(n log k) instead of sorting every upstream result
+    best = heapq.nlargest(top_k, range(len(items)), key=lambda i: (scores[i], -i))
+    ranked = [items[i] for i in best]
+    if fields:
+        ranked = [{k: item.get(k) for k in fields} for item in ranked]
+
+    stats = trim_stats.setdefault(tool_name, {"calls": 0, "items_in": 0, "items_out": 0, "tokens_in": 0, "tokens_out": 0})
+    stats["calls"] += 1
+    stats["items_in"] += len(items)
+    stats["items_out"] += len(ranked)
+    stats["tokens_in"] += tokens_in
+    stats["tokens_out"] += count_tokens(ranked)
+    return ranked
@@ -0,0 +1,121 @@
+import os
+import time
+import sqlite3
+import asyncio
+import hashlib
+from app.agent.telemetry import metrics, record_rate_limit_wait
+
+
+metrics.describe("travel_rate_limit_wait_seconds", "histogram", "Time spent waiting for an upstream rate-limit token")
+
+
+def _refill(tokens, updated, rate, burst, now):
+    return min(burst, tokens + (now - updated) * rate)
+
+
+class MemoryBucketStore:
+    """Token buckets for this process only."""
+
+    def __init__(self):
+        self.buckets = {}
+
+    async def reserve(self, key, rate, burst, now):
+        tokens, updated = self.buckets.get(key, (burst, now))
+        tokens = _refill(tokens, updated, rate, burst, now) - 1
+        self.buckets[key] = (tokens, now)
+        return max(0.0, -tokens / rate)
+
+    async def refund(self, key):
+        tokens, updated = self.buckets[key]
+        self.buckets[key] = (tokens + 1, updated)
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets in a SQLite file, so every uvicorn worker on the host draws from the same
+    quota. Each reservation is one IMMEDIATE transaction (read, refill, take, write).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def _reserve(self, key, rate, burst, now):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = _refill(tokens, updated, rate, burst, now) - 1
+            conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (key, tokens, now))
+            conn.execute("COMMIT")
+        return max(0.0, -tokens / rate)
+
+    def _refund(self, key):
+        with self._connect() as conn:
+            conn.execute("UPDATE buckets SET tokens = tokens + 1 WHERE key = ?", (key,))
+
+    async def reserve(self, key, rate, burst, now):
+        return await asyncio.to_thread(self._reserve, key, rate, burst, now)
+
+    async def refund(self, key):
+        await asyncio.to_thread(self._refund, key)
+
+
+class RateLimiter:
+    """
+    Client-side token buckets, one per upstream and API key. A call over the rate is not failed:
+    it reserves the next token and sleeps until it is due, so concurrent callers queue in order.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or MemoryBucketStore()
+        self.counters = {}
+
+    async def acquire(self, key, rate, burst, max_wait=None):
+        """
+        Wait for a token. Returns the seconds waited, or None (token given back) if the wait
+        would be longer than `max_wait`.
+        """
+        if rate <= 0:
+            return 0.0
+        wait = await self.store.reserve(key, rate, burst, time.time())
+        if max_wait is not None and wait > max_wait:
+            await self.store.refund(key)
+            return None
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        upstream = key.split(":")[0]
+        counts = self.counters.setdefault(key, {"acquired": 0, "waited": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0})
+        counts["acquired"] += 1
+        if wait > 0:
+            counts["waited"] += 1
+            counts["wait_seconds"] += wait
+            counts["max_wait_seconds"] = max(counts["max_wait_seconds"], wait)
+        metrics.observe("travel_rate_limit_wait_seconds", {"upstream": upstream}, wait)
+        record_rate_limit_wait(wait)
+        return wait
+
+    def stats(self):
+        return {"backend": type(self.store).__name__, "buckets": self.counters}
+
+
+def credential_key(upstream, request):
+    """Bucket key for a request: upstream name plus a hash of the API key it carries (never the key itself)."""
+    credential = (request.headers.get("x-rapidapi-key") or request.headers.get("authorization")
+                  or request.url.params.get("key") or request.url.params.get("appid") or "")
+    return f"{upstream}:{hashlib.sha256(credential.encode()).hexdigest()[:8]}"
+
+
+def create_rate_limiter():
+    """RATE_LIMIT_DB=<path> shares the buckets across workers through SQLite; otherwise per process."""
+    path = os.getenv("RATE_LIMIT_DB")
+    return RateLimiter(SQLiteBucketStore(path) if path else MemoryBucketStore())
+
+
+rate_limiter = create_rate_limiter()
@@ -0,0 +1,84 @@
+import os
+import json
+import html
+from datetime import datetime, timezone
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from langchain_core.messages import AIMessage, ToolMessage
+from app.agent.tool_cache import is_error
+
+
+def _utc_time(timestamp):
+    if not timestamp:
+        return "N/A"
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%H:%M")
+
+
+env = Environment(
+    loader=FileSystemLoader(os.path.join(os.path.dirname(__file__), "templates")),
+    autoescape=select_autoescape(["html", "j2"]),
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+env.filters["utc_time"] = _utc_time
+
+# Tool name -> (template, template variable, extra context)
+TEMPLATES = {
+    "get_hotels_by_area_and_radius": ("hotels.html.j2", "items", {}),
+    "get_weather": ("weather.html.j2", "w", {}),
+    "get_places": ("places.html.j2", "items", {"limit": 5}),
+    "get_flight_fares": ("flights.html.j2", "items", {}),
+}
+
+
+def render_tool_result(tool_name, data):
+    """Render one tool's structured result as HTML. Same input, same bytes."""
+    if not data:
+        return "<p>No results found.</p>"
+    template, var, extra = TEMPLATES[tool_name]
+    return env.get_template(template).render({var: data, **extra}).strip()
+
+
+def _final_tool_results(messages):
+    """The tool results after the expert's last tool-calling turn, in call order."""
+    results = []
+    for message in reversed(messages):
+        if isinstance(message, AIMessage):
+            break
+        if isinstance(message, ToolMessage) and message.name in TEMPLATES:
+            results.append(message)
+    return results[::-1]
+
+
+def render_expert_result(messages):
+    """
+    HTML for an expert run: the tool results after the expert's last tool-calling turn, rendered
+    server-side. If the expert answered without calling a tool (e.g. to ask for a missing date),
+    its text is escaped and returned as a paragraph.
+    """
+    results = _final_tool_results(messages)
+    if not results:
+        return f"<p>{html.escape(messages[-1].content)}</p>"
+
+    parts = []
+    for message in results:
+        try:
+            data = json.loads(message.content)
+        except (TypeError, ValueError):
+            parts.append(f"<p>{html.escape(str(message.content))}</p>")
+            continue
+        parts.append(render_tool_result(message.name, data))
+    return "\n".join(parts)
+
+
+def expert_result_failed(messages):
+    """True if a tool result render_expert_result shows is a failed call or an error payload."""
+    for message in _final_tool_results(messages):
+        if message.status == "error":
+            return True
+        try:
+            data = json.loads(message.content)
+        except (TypeError, ValueError):
+            return True
+        if is_error(data):
+            return True
+    return False
@@ -0,0 +1,259 @@
+import time
+import random
+import asyncio
+import email.utils
+from contextvars import ContextVar
+import httpx
+from app.agent.telemetry import metrics
+from app.agent.rate_limit import credential_key
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+metrics.describe("travel_http_retries_total", "counter", "Upstream HTTP attempts retried")
+metrics.describe("travel_http_breaker_rejections_total", "counter", "Upstream calls rejected by an open circuit breaker")
+
+# Event-loop time by which the current job must be finished (None: no deadline). Set per job in
+# trip_events; every upstream attempt and backoff sleep is cut to fit in what is left.
+job_deadline = ContextVar("job_deadline", default=None)
+
+
+def time_left():
+    """Seconds until the current job's deadline, or None if it has none."""
+    deadline = job_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - asyncio.get_running_loop().time()
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """The job's overall deadline passed before (or while) calling an upstream."""
+
+
+class CircuitOpen(httpx.TransportError):
+    """The upstream's circuit breaker is open: it failed repeatedly and is not called for a while."""
+
+
+def retry_after_seconds(response):
+    """Retry-After as seconds (delta-seconds or HTTP-date form), or None."""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through, consecutive failures are counted. After `failure_threshold` of them it
+    opens: calls fail immediately for `reset_after` seconds. Then it is half-open: one probe call is
+    let through; success closes it, failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_after=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.counters = {"opened": 0, "rejected": 0}
+
+    def allow(self):
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_after:
+                return self._reject()
+            self.state = "half_open"
+            self.probing = False
+        if self.state == "half_open":
+            if self.probing:
+                return self._reject()
+            self.probing = True
+        return True
+
+    def _reject(self):
+        self.counters["rejected"] += 1
+        metrics.inc("travel_http_breaker_rejections_total", {"upstream": self.name})
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.counters["opened"] += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """A probe ended without an outcome (e.g. cancelled): let the next call probe."""
+        self.probing = False
+
+    def stats(self):
+        return {"state": self.state, "consecutive_failures": self.failures, **self.counters}
+
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps an upstream's transport with a per-attempt deadline (cut to the job's remaining time),
+    retries of idempotent requests on connection errors, timeouts, 429 and 5xx with exponential
+    backoff and full jitter (or the upstream's Retry-After, if longer), and a circuit breaker.
+    With a `limiter`, every attempt first waits for a token of the upstream's rate (req/s, `burst`).
+    """
+
+    def __init__(self, name, inner, timeout=10.0, retries=2, backoff_base=0.25, backoff_max=4.0,
+                 max_retry_after=10.0, breaker=None, limiter=None, rate=0.0, burst=1):
+        self.name = name
+        self.inner = inner
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self.breaker = breaker or CircuitBreaker(name)
+        self.limiter = limiter
+        self.rate = rate
+        self.burst = burst
+        self.counters = {"attempts": 0, "retries": 0, "timeouts": 0, "deadline_exceeded": 0}
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _budget(self, request):
+        """Timeout for one attempt, or raise if the job has no time left."""
+        left = time_left()
+        if left is not None and left <= 0:
+            self.counters["deadline_exceeded"] += 1
+            raise DeadlineExceeded(f"Job deadline exceeded before calling {self.name}", request=request)
+        return self.timeout if left is None else min(self.timeout, left)
+
+    async def _wait_for_token(self, request):
+        if self.limiter is None or self.rate <= 0:
+            return
+        waited = await self.limiter.acquire(credential_key(self.name, request), self.rate, self.burst, max_wait=time_left())
+        if waited is None:
+            self.counters["deadline_exceeded"] += 1
+            raise DeadlineExceeded(f"Job deadline leaves no time to wait for a {self.name} rate-limit token", request=request)
+
+    async def _attempt(self, request, budget):
+        if not self.breaker.allow():
+            raise CircuitOpen(f"{self.name} is failing; not calling it for now", request=request)
+        self.counters["attempts"] += 1
+        # httpx timeouts apply per connect / read chunk; also cap them to this attempt's budget
+        request.extensions["timeout"] = {k: min(v, budget) if v else budget
+                                         for k, v in request.extensions.get("timeout", {}).items()}
+        try:
+            response = await asyncio.wait_for(self.inner.handle_async_request(request), budget)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            # Cut short by the job deadline rather than the upstream's own timeout: not its fault
+            if budget < self.timeout:
+                self.breaker.release()
+            else:
+                self.breaker.record_failure()
+            raise httpx.ReadTimeout(f"{self.name} did not respond within {budget:.1f}s", request=request)
+        except httpx.TransportError:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled (e.g. a losing hedge) or an unexpected error: no verdict on the upstream
+            self.breaker.release()
+            raise
+        # 4xx means the upstream is up; only 5xx counts against it
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    async def handle_async_request(self, request):
+        attempts = self.retries + 1 if request.method in IDEMPOTENT_METHODS else 1
+        for attempt in range(attempts):
+            await self._wait_for_token(request)
+            budget = self._budget(request)
+            last = attempt == attempts - 1
+            try:
+                response = await self._attempt(request, budget)
+            except CircuitOpen:
+                raise
+            except httpx.TransportError:
+                if last:
+                    raise
+                delay = self._backoff(attempt)
+                response = None
+            else:
+                if response.status_code not in RETRY_STATUSES or last:
+                    return response
+                retry_after = retry_after_seconds(response)
+                if retry_after is not None and retry_after > self.max_retry_after:
+                    return response
+                delay = max(self._backoff(attempt), retry_after or 0.0)
+
+            # Do not sleep past the job's deadline: give up with what we have instead
+            left = time_left()
+            if left is not None and delay >= left:
+                if response is not None:
+                    return response
+                self.counters["deadline_exceeded"] += 1
+                raise DeadlineExceeded(f"Job deadline leaves no time to retry {self.name}", request=request)
+            if response is not None:
+                await response.aclose()
+            self.counters["retries"] += 1
+            metrics.inc("travel_http_retries_total", {"upstream": self.name})
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+    def stats(self):
+        return {**self.counters, "breaker": self.breaker.stats()}
+
+
+async def hedged(call, delay, hedges=1, accept=lambda result: True):
+    """
+    Run `call()`; if it has not produced an acceptable result after `delay` seconds (or failed),
+    start another copy, up to `hedges` extra. The first acceptable result wins and the rest are
+    cancelled. Trades a little extra upstream load for a shorter latency tail.
+    """
+    pending = set()
+    launched = 0
+    result, error = None, None
+
+    def launch():
+        nonlocal launched
+        launched += 1
+        pending.add(asyncio.ensure_future(call()))
+
+    launch()
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=delay if launched <= hedges else None,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                elif accept(task.result()):
+                    return task.result()
+                else:
+                    result = task.result()
+            if launched <= hedges:
+                launch()
+    finally:
+        for task in pending:
+            task.cancel()
+    if result is not None:
+        return result
+    raise error
@@ -0,0 +1,123 @@
+import os
+import re
+import time
+from collections import OrderedDict
+from datetime import date
+from app.agent.telemetry import record_cache
+
+
+# How long an answer stays valid depends on the most volatile data it was built from
+EXPERT_TTLS = {
+    "weather_expert": float(os.getenv("RESPONSE_TTL_WEATHER", "600")),
+    "hotel_search_expert": float(os.getenv("RESPONSE_TTL_HOTELS", "300")),
+    "flight_fares_search_expert": float(os.getenv("RESPONSE_TTL_FLIGHTS", "300")),
+    "place_search_expert": float(os.getenv("RESPONSE_TTL_PLACES", str(3 * 86400))),
+}
+
+
+def normalize_message(message):
+    """Exact-match key: case-folded, punctuation-insensitive, whitespace collapsed."""
+    message = re.sub(r"[^\w\s,-]", " ", message.casefold())
+    return re.sub(r"\s+", " ", message).strip()
+
+
+class ResponseCache:
+    """
+    Cache of final trip-planning responses keyed by the user's message.
+
+    Exact tier: normalized message -> response, bounded LRU.
+    Semantic tier (optional): nearest cached message by embedding cosine similarity, searched in a
+    local in-memory index; only used above `similarity_threshold`.
+
+    Keys include today's date so answers to relative dates ("tomorrow") are not served on another day.
+    """
+
+    def __init__(self, max_size=1000, semantic=False, similarity_threshold=0.95):
+        self.max_size = max_size
+        self.semantic = semantic
+        self.similarity_threshold = similarity_threshold
+        self.entries = OrderedDict()
+        self.embeddings = None
+        self.counters = {"hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0}
+
+    def _key(self, message):
+        return f"{date.today().isoformat()}|{normalize_message(message)}"
+
+    def _embedder(self):
+        if self.embeddings is None:
+            from langchain_openai import OpenAIEmbeddings
+            self.embeddings = OpenAIEmbeddings(model=os.getenv("RESPONSE_CACHE_EMBEDDING_MODEL", "text-embedding-3-small"))
+        return self.embeddings
+
+    def _live(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry["expires_at"] < time.time():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def _nearest(self, key, vector):
+        import numpy as np
+
+        day = key.split("|", 1)[0]
+        candidates = [(k, e) for k, e in self.entries.items() if e.get("vector") is not None and k.startswith(day)]
+        if not candidates:
+            return None
+        matrix = np.array([e["vector"] for _, e in candidates])
+        scores = matrix @ np.asarray(vector)
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        return self._live(candidates[best][0])
+
+    async def get(self, message):
+        """Return the cached response for `message`, or None."""
+        key = self._key(message)
+        entry = self._live(key)
+        if entry is not None:
+            self.counters["hits"] += 1
+            record_cache("response", True)
+            return entry["response"]
+
+        if self.semantic and self.entries:
+            vector = await self._embedder().aembed_query(normalize_message(message))
+            entry = self._nearest(key, vector)
+            if entry is not None:
+                self.counters["semantic_hits"] += 1
+                record_cache("response", True)
+                return entry["response"]
+
+        self.counters["misses"] += 1
+        record_cache("response", False)
+        return None
+
+    async def set(self, message, response, experts):
+        """Store `response`; its TTL is the shortest among the experts that produced it."""
+        ttls = [EXPERT_TTLS[e] for e in experts if e in EXPERT_TTLS]
+        if not ttls:
+            return
+        vector = None
+        if self.semantic:
+            # OpenAI embeddings are unit length, so a dot product is the cosine similarity
+            vector = await self._embedder().aembed_query(normalize_message(message))
+        key = self._key(message)
+        self.entries[key] = {"response": response, "expires_at": time.time() + min(ttls), "vector": vector}
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        self.counters["stores"] += 1
+
+    def stats(self):
+        return {**self.counters, "size": len(self.entries), "max_size": self.max_size, "semantic": self.semantic}
+
+
+response_cache = ResponseCache(
+    max_size=int(os.getenv("RESPONSE_CACHE_SIZE", "1000")),
+    semantic=os.getenv("RESPONSE_CACHE_SEMANTIC", "0") == "1",
+    similarity_threshold=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95")),
+)
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
@@ -1,9 +1,91 @@
-from typing import Literal
+from typing import Annotated, Literal, Optional
 from typing_extensions import TypedDict
 from langgraph.graph import MessagesState
+from app.agent.tools import get_flight_fares, get_hotels_by_area_and_radius, get_places, get_weather
+
+Expert = Literal["hotel_search_expert", "weather_expert", "place_search_expert", "flight_fares_search_expert"]
+
+
+# Tool arguments the router can fill in directly, so the expert calls its tool without an LLM turn.
+# The fields (names, types, which are required) come from each tool's own signature, so every
+# constraint a user can state (stars, guests, rooms, cabin class, currency...) can be passed on;
+# only the hints below are written here. Optional fields are left empty unless the user stated them.
+ARG_HINTS = {
+    "location": "Area, locality or city to search, e.g. 'Koramangala, Bangalore'",
+    "arrival_date": "Check-in date (YYYY-MM-DD)",
+    "departure_date": "Check-out date (YYYY-MM-DD)",
+    "star_rating": "Comma-separated star classes, e.g. '4,5'",
+    "room_qty": "Number of rooms",
+    "guest_qty": "Number of adult guests",
+    "children_qty": "Number of children",
+    "children_age": "Comma-separated ages of the children",
+    "currency": "Price currency, e.g. 'USD', 'INR'",
+    "language": "Response language, e.g. 'en-us'",
+    "travel_purpose": "'leisure' or 'business'",
+    "pages": "Result pages to fetch (2-5 for large areas like whole cities)",
+    "city": "City name",
+    "query": "Type of places, e.g. 'attractions', 'museums', 'restaurants'",
+    "from_code": "IATA code of the departure airport, or the city name if no code was given",
+    "to_code": "IATA code of the arrival airport, or the city name if no code was given",
+    "date": "Travel date (YYYY-MM-DD)",
+    "adult": "Number of adult passengers",
+    "type_": "Cabin class: 'economy', 'premium_economy', 'business' or 'first'",
+}
+# Tool parameters the router never sets (paging, and values the tool derives itself)
+INTERNAL_ARGS = {"offset", "order_by", "categories_filter"}
+
+
+def tool_args_schema(name, tool):
+    """TypedDict of `tool`'s arguments for structured output, as Annotated[type, default, description]."""
+    fields = {}
+    for arg, field in tool.args_schema.model_fields.items():
+        if arg in INTERNAL_ARGS:
+            continue
+        hint = ARG_HINTS.get(arg, arg.replace("_", " "))
+        if field.is_required():
+            fields[arg] = Annotated[field.annotation, ..., hint]
+        else:
+            fields[arg] = Annotated[Optional[field.annotation], None, f"{hint}; only if the user stated it (default: {field.default!r})"]
+    schema = TypedDict(name, fields)
+    schema.__doc__ = f"Arguments for {tool.name}."
+    return schema
+
+
+HotelArgs = tool_args_schema("HotelArgs", get_hotels_by_area_and_radius)
+WeatherArgs = tool_args_schema("WeatherArgs", get_weather)
+PlaceArgs = tool_args_schema("PlaceArgs", get_places)
+FlightArgs = tool_args_schema("FlightArgs", get_flight_fares)
+
+
+_ARGS_HINT = ("Fill in only if this expert is needed, needs exactly one tool call and all its required values are known; "
+              "include every constraint the user stated")
 
 class Router(TypedDict):
-    next: Literal["hotel_search_expert", "weather_expert", "place_search_expert", "flight_fares_search_expert", 'FINISH']
+    next: Literal[Expert, 'FINISH']
+    hotel_args: Annotated[Optional[HotelArgs], None, _ARGS_HINT]
+    weather_args: Annotated[Optional[WeatherArgs], None, _ARGS_HINT]
+    place_args: Annotated[Optional[PlaceArgs], None, _ARGS_HINT]
+    flight_args: Annotated[Optional[FlightArgs], None, _ARGS_HINT]
+
+class Plan(TypedDict):
+    """Planning-mode router: every expert needed for the query, chosen in one call."""
+    experts: list[Expert]
+    hotel_args: Annotated[Optional[HotelArgs], None, _ARGS_HINT]
+    weather_args: Annotated[Optional[WeatherArgs], None, _ARGS_HINT]
+    place_args: Annotated[Optional[PlaceArgs], None, _ARGS_HINT]
+    flight_args: Annotated[Optional[FlightArgs], None, _ARGS_HINT]
+
+# Router output field -> expert it parameterizes
+ARGS_FIELDS = {
+    "hotel_args": "hotel_search_expert",
+    "weather_args": "weather_expert",
+    "place_args": "place_search_expert",
+    "flight_args": "flight_fares_search_expert",
+}
 
 class State(MessagesState):
-    next: str
\ No newline at end of file
+    next: str
+    # Parameters extracted by the fast-path router (IATA codes, dates, city), if it routed the query
+    params: dict
+    # Expert name -> tool arguments chosen by a router, for the direct tool-calling path
+    tool_args: Optional[dict]
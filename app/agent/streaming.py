@@ -0,0 +1,164 @@
+import os
+import asyncio
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from app.agent.agent import EXPERTS
+from app.agent.checkpointing import delete_thread, ensure_checkpointer, prune_thread, touch_thread
+from app.agent.response_cache import RESPONSE_CACHE_ENABLED, response_cache
+from app.agent.resilience import job_deadline
+from app.agent.telemetry import JobTrace, TraceCallback, current_trace, metrics
+
+
+# Overall time budget of one trip job in seconds (0: none). Upstream calls and retries are cut to
+# fit in what is left; when it runs out the job ends with whatever the experts produced so far.
+JOB_DEADLINE = float(os.getenv("JOB_DEADLINE", "120"))
+
+metrics.describe("travel_job_timeouts_total", "counter", "Trip jobs ended by the job deadline")
+
+
+# Nodes whose updates are routing decisions rather than answers
+ROUTER_NODES = ("fast_router", "supervisor", "planner")
+# Nodes whose updates are bookkeeping and never shown (compacted copies of earlier messages)
+HIDDEN_NODES = ("compact_history",)
+
+
+def _outer_node(namespace, metadata):
+    """Top-level graph node an event belongs to (events from expert react agents are nested)."""
+    return namespace[0].split(":")[0] if namespace else metadata.get("langgraph_node")
+
+
+async def trip_events(graph, message, thread_id, deadline=JOB_DEADLINE, persist=True):
+    """
+    Run the travel graph for one user message and yield (event, data) pairs as they happen:
+
+    - ("route", {"node", "next"}): a supervisor/planner routing decision
+    - ("token", {"node", "content"}): an LLM output token
+    - ("progress", {"node", ...}): partial progress reported by a tool (e.g. hotel pages fetched)
+    - ("expert", {"node", "content"}): a node's finished output message
+    - ("done", {"response", "cached", "timings", "thread_id"}): the final response (last message
+      produced) and the job's timing breakdown (graph nodes, LLM calls, upstream HTTP calls, cache lookups)
+
+    Messages on the same `thread_id` continue one conversation (when the graph has a checkpointer).
+    Repeat first messages are answered from the response cache without running the graph. If the job
+    runs past `deadline` seconds it is cancelled and "done" carries the expert outputs produced so
+    far, with "timed_out": True. With `persist=False` the thread is deleted when the job ends (one-off
+    queries, e.g. batch items, that will never be followed up).
+    """
+    trace = JobTrace()
+    loop = asyncio.get_running_loop()
+    ends_at = loop.time() + deadline if deadline else None
+    queue = asyncio.Queue()
+
+    async def produce():
+        # Own task, own context: the trace and deadline apply to this job's graph run only
+        current_trace.set(trace)
+        job_deadline.set(ends_at)
+        try:
+            async for item in _trip_events(graph, message, thread_id, trace):
+                await queue.put(item)
+        except Exception as e:
+            await queue.put(("error", e))
+        await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    outputs = []
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), None if ends_at is None else max(0.0, ends_at - loop.time()))
+            except asyncio.TimeoutError:
+                producer.cancel()
+                metrics.inc("travel_job_timeouts_total")
+                partial = "\n".join(outputs) or f"Sorry, planning this trip took longer than {deadline:g} seconds."
+                item = ("done", {"response": partial, "cached": False, "timed_out": True})
+            if item is None:
+                break
+
+            event, data = item
+            if event == "error":
+                raise data
+            if event == "expert" and data["node"] in EXPERTS:
+                outputs.append(data["content"])
+            if event == "done":
+                data["thread_id"] = thread_id
+                data["timings"] = trace.summary()
+                metrics.observe("travel_job_seconds", {"cached": str(data["cached"]).lower()}, data["timings"]["total_seconds"])
+            yield event, data
+            if data.get("timed_out"):
+                break
+    finally:
+        producer.cancel()
+        if not persist:
+            await asyncio.gather(producer, return_exceptions=True)
+            await delete_thread(graph, thread_id)
+
+
+async def _history(graph, config):
+    """Messages already in the thread (none without a checkpointer)."""
+    if graph.checkpointer is None:
+        return []
+    state = await graph.aget_state(config)
+    return state.values.get("messages", [])
+
+
+async def _trip_events(graph, message, thread_id, trace):
+    await ensure_checkpointer(graph)
+    await touch_thread(graph, thread_id)
+    config = {"configurable": {"thread_id": thread_id}}
+
+    # Only a conversation's first message is answered from (and stored in) the response cache:
+    # follow-ups depend on what was said before
+    first_turn = not await _history(graph, config)
+    if RESPONSE_CACHE_ENABLED and first_turn:
+        cached = await response_cache.get(message)
+        if cached is not None:
+            if graph.checkpointer is not None:
+                # Record the turn, so follow-ups on this thread see the cached answer as context
+                final = "join_results" if "join_results" in graph.nodes else "supervisor"
+                await graph.aupdate_state(config, {"messages": [HumanMessage(content=message), AIMessage(content=cached, name="travel_planner")]}, as_node=final)
+            yield "done", {"response": cached, "cached": True}
+            return
+
+    stream = graph.astream(
+        {"messages": [HumanMessage(content=message)]},
+        config={**config, "callbacks": [TraceCallback(trace)]},
+        stream_mode=["updates", "messages", "custom"],
+        subgraphs=True
+    )
+
+    response = None
+    experts = set()
+    failed = False
+    async for namespace, mode, chunk in stream:
+        if mode == "messages":
+            token, metadata = chunk
+            if isinstance(token, AIMessageChunk) and token.content:
+                yield "token", {"node": _outer_node(namespace, metadata), "content": token.content}
+            continue
+
+        if mode == "custom":
+            yield "progress", {"node": _outer_node(namespace, {}), **chunk}
+            continue
+
+        # Only top-level node updates; the expert react agents' inner steps are not events
+        if namespace:
+            continue
+
+        for node, update in chunk.items():
+            if not update or node in HIDDEN_NODES:
+                continue
+            if node in ROUTER_NODES:
+                yield "route", {"node": node, "next": update.get("next")}
+            for msg in update.get("messages", []):
+                failed = failed or bool(msg.additional_kwargs.get("error"))
+                if msg.content:
+                    response = msg.content
+                    if node in EXPERTS:
+                        experts.add(node)
+                    yield "expert", {"node": node, "content": msg.content}
+
+    # Answers showing a tool error are not cached: the next identical query retries the upstream
+    if RESPONSE_CACHE_ENABLED and first_turn and response and not failed:
+        await response_cache.set(message, response, experts)
+    await prune_thread(graph, thread_id)
+
+    yield "done", {"response": response or "No response.", "cached": False}
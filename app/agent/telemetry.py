@@ -0,0 +1,185 @@
+import math
+import time
+from contextvars import ContextVar
+from collections import defaultdict
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def percentile(values, p):
+    """Nearest-rank percentile: the smallest value with at least p% of the values at or below it."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class Metrics:
+    """Process-wide counters and latency histograms, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self.help = {}
+        self.counters = defaultdict(float)
+        self.histograms = {}
+
+    def describe(self, name, kind, help_text):
+        self.help[name] = (kind, help_text)
+
+    def inc(self, name, labels=None, value=1.0):
+        self.counters[(name, tuple(sorted((labels or {}).items())))] += value
+
+    def observe(self, name, labels, seconds):
+        key = (name, tuple(sorted(labels.items())))
+        hist = self.histograms.setdefault(key, {"buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0})
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                hist["buckets"][i] += 1
+        hist["sum"] += seconds
+        hist["count"] += 1
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in pairs) + "}"
+
+    def render(self):
+        lines = []
+        for name in sorted({n for n, _ in self.counters} | {n for n, _ in self.histograms}):
+            kind, help_text = self.help.get(name, ("untyped", name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (n, labels), value in sorted(self.counters.items()):
+                if n == name:
+                    lines.append(f"{name}{self._labels(labels)} {value}")
+            for (n, labels), hist in sorted(self.histograms.items()):
+                if n != name:
+                    continue
+                for bound, count in zip(LATENCY_BUCKETS, hist["buckets"]):
+                    lines.append(f"{name}_bucket{self._labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{self._labels(labels, [('le', '+Inf')])} {hist['count']}")
+                lines.append(f"{name}_sum{self._labels(labels)} {hist['sum']}")
+                lines.append(f"{name}_count{self._labels(labels)} {hist['count']}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.describe("travel_node_seconds", "histogram", "Graph node latency")
+metrics.describe("travel_llm_seconds", "histogram", "LLM call latency")
+metrics.describe("travel_llm_tokens_total", "counter", "LLM tokens by model and type")
+metrics.describe("travel_http_seconds", "histogram", "Upstream HTTP request latency")
+metrics.describe("travel_http_requests_total", "counter", "Upstream HTTP requests by host and status")
+metrics.describe("travel_http_response_bytes_total", "counter", "Upstream HTTP response bytes by host")
+metrics.describe("travel_cache_requests_total", "counter", "Cache lookups by cache and result")
+metrics.describe("travel_job_seconds", "histogram", "End-to-end trip planning latency")
+
+
+class JobTrace:
+    """Timing breakdown of one trip-planning job: graph nodes, LLM calls, upstream HTTP calls, cache lookups."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.nodes = []
+        self.llm_calls = []
+        self.http_calls = []
+        self.cache = defaultdict(lambda: {"hits": 0, "misses": 0})
+        self.rate_limit_wait = 0.0
+
+    def summary(self):
+        return {
+            "total_seconds": round(time.perf_counter() - self.started, 4),
+            "nodes": self.nodes,
+            "llm_calls": self.llm_calls,
+            "http_calls": self.http_calls,
+            "cache": dict(self.cache),
+            "rate_limit_wait_seconds": round(self.rate_limit_wait, 4),
+            "prompt_tokens": sum(c["prompt_tokens"] or 0 for c in self.llm_calls),
+            "completion_tokens": sum(c["completion_tokens"] or 0 for c in self.llm_calls),
+        }
+
+
+# Trace of the job running in the current task; copied into the tasks LangGraph and asyncio spawn
+current_trace = ContextVar("current_trace", default=None)
+
+
+def record_http(host, status, nbytes, seconds):
+    metrics.observe("travel_http_seconds", {"host": host}, seconds)
+    metrics.inc("travel_http_requests_total", {"host": host, "status": status})
+    metrics.inc("travel_http_response_bytes_total", {"host": host}, nbytes)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.http_calls.append({"host": host, "status": status, "bytes": nbytes, "seconds": round(seconds, 4)})
+
+
+def record_rate_limit_wait(seconds):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.rate_limit_wait += seconds
+
+
+def record_cache(cache, hit):
+    metrics.inc("travel_cache_requests_total", {"cache": cache, "result": "hit" if hit else "miss"})
+    trace = current_trace.get()
+    if trace is not None:
+        trace.cache[cache]["hits" if hit else "misses"] += 1
+
+
+class TraceCallback(BaseCallbackHandler):
+    """LangChain callback recording top-level graph node and LLM call timings into a JobTrace."""
+
+    run_inline = True
+
+    def __init__(self, trace):
+        self.trace = trace
+        self.started = {}
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        # Only the outer graph's nodes, not the steps of the expert react agents inside them
+        if node and kwargs.get("name") == node and "|" not in metadata.get("langgraph_checkpoint_ns", "|"):
+            self.started[run_id] = (node, time.perf_counter())
+
+    def _end_chain(self, run_id):
+        if run_id in self.started:
+            node, started = self.started.pop(run_id)
+            seconds = time.perf_counter() - started
+            self.trace.nodes.append({"node": node, "seconds": round(seconds, 4)})
+            metrics.observe("travel_node_seconds", {"node": node}, seconds)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end_chain(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end_chain(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, invocation_params=None, **kwargs):
+        metadata = metadata or {}
+        model = (invocation_params or {}).get("model") or (invocation_params or {}).get("model_name") or metadata.get("ls_model_name") or "unknown"
+        node = metadata.get("langgraph_checkpoint_ns", "").split(":")[0] or metadata.get("langgraph_node")
+        self.started[run_id] = ((model, node), time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        if run_id not in self.started:
+            return
+        (model, node), started = self.started.pop(run_id)
+        seconds = time.perf_counter() - started
+        usage = {}
+        try:
+            usage = response.generations[0][0].message.usage_metadata or {}
+        except (AttributeError, IndexError):
+            pass
+        if not usage:
+            token_usage = (response.llm_output or {}).get("token_usage", {})
+            usage = {"input_tokens": token_usage.get("prompt_tokens"), "output_tokens": token_usage.get("completion_tokens")}
+
+        prompt_tokens, completion_tokens = usage.get("input_tokens"), usage.get("output_tokens")
+        self.trace.llm_calls.append({"model": model, "node": node, "seconds": round(seconds, 4),
+                                     "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})
+        metrics.observe("travel_llm_seconds", {"model": model}, seconds)
+        metrics.inc("travel_llm_tokens_total", {"model": model, "type": "prompt"}, prompt_tokens or 0)
+        metrics.inc("travel_llm_tokens_total", {"model": model, "type": "completion"}, completion_tokens or 0)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self.started.pop(run_id, None)
@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import asyncio
+import inspect
+import functools
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import date
+from app.agent.telemetry import record_cache
+
+
+def is_error(result):
+    """Error payloads (and empty-result messages) are never cached."""
+    if isinstance(result, dict):
+        return "error" in result
+    if isinstance(result, list) and result and isinstance(result[0], dict):
+        return "error" in result[0] or "message" in result[0]
+    return False
+
+
+def _normalize(value):
+    return value.strip().casefold() if isinstance(value, str) else value
+
+
+class ToolCache:
+    """
+    Process-wide cache for upstream tool results, shared by every `cached_tool` function.
+
+    Entries are fresh for `ttl` seconds, then served stale for up to `stale_ttl` more seconds while
+    one background call refreshes them. Concurrent misses for the same key share one upstream call.
+    """
+
+    def __init__(self, max_size=2048):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.counters = {}
+
+    def _count(self, name, counter):
+        counts = self.counters.setdefault(name, {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "refreshes": 0})
+        counts[counter] += 1
+        if counter != "refreshes":
+            record_cache(f"tool:{name}", counter != "misses")
+
+    def _refresh(self, key, call, ttl, stale_ttl):
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, call, ttl, stale_ttl))
+            self.in_flight[key] = task
+            task.add_done_callback(functools.partial(self._done, key))
+        return task
+
+    def _done(self, key, task):
+        self.in_flight.pop(key, None)
+        # Background refreshes have no awaiting caller; retrieve their error so it is not logged as lost
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch(self, key, call, ttl, stale_ttl):
+        result = await call()
+        if not is_error(result):
+            now = time.time()
+            self.entries[key] = (result, now + ttl, now + ttl + stale_ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return result
+
+    async def get_or_call(self, key, name, call, ttl, stale_ttl):
+        now = time.time()
+        entry = self.entries.get(key)
+        if entry is not None:
+            result, fresh_until, stale_until = entry
+            if now < fresh_until:
+                self._count(name, "hits")
+                self.entries.move_to_end(key)
+                return result
+            if now < stale_until:
+                self._count(name, "stale_hits")
+                if key not in self.in_flight:
+                    self._count(name, "refreshes")
+                    self._refresh(key, call, ttl, stale_ttl)
+                return result
+            del self.entries[key]
+
+        if key in self.in_flight:
+            self._count(name, "coalesced")
+        else:
+            self._count(name, "misses")
+        return await asyncio.shield(self._refresh(key, call, ttl, stale_ttl))
+
+    def stats(self):
+        return {"size": len(self.entries), "max_size": self.max_size, "in_flight": len(self.in_flight), "tools": self.counters}
+
+
+tool_cache = ToolCache(max_size=int(os.getenv("TOOL_CACHE_SIZE", "2048")))
+
+
+class SharedCalls:
+    """
+    Calls shared within one unit of work (a batch): the first call for a key runs, identical calls
+    made meanwhile or later await its result. Unlike the tool cache this does not depend on TTLs or
+    cache size, so a batch never repeats an upstream call. Failed calls are forgotten (and retried).
+    """
+
+    def __init__(self):
+        self.tasks = {}
+        self.counters = {"calls": 0, "shared": 0}
+
+    def _done(self, key, task):
+        if task.cancelled() or task.exception() is not None or is_error(task.result()):
+            self.tasks.pop(key, None)
+
+    async def call(self, key, call):
+        task = self.tasks.get(key)
+        if task is None:
+            self.counters["calls"] += 1
+            task = asyncio.ensure_future(call())
+            self.tasks[key] = task
+            task.add_done_callback(functools.partial(self._done, key))
+        else:
+            self.counters["shared"] += 1
+        return await asyncio.shield(task)
+
+
+# The SharedCalls of the batch the current task belongs to, if any (set per batch item)
+shared_calls = ContextVar("shared_calls", default=None)
+
+
+def cached_tool(ttl, stale_ttl=0, date_sensitive=False):
+    """
+    Cache an async tool function's result by all of its (normalized) arguments, defaults included.
+    Apply it below `@tool` so the tool schema is still built from the original signature.
+
+    `date_sensitive` adds today's date to the key, for tools that default missing dates to today.
+    TTLs can be overridden with TOOL_CACHE_TTL_<FUNCTION_NAME> / TOOL_CACHE_STALE_<FUNCTION_NAME>.
+    """
+    def decorator(fn):
+        name = fn.__name__
+        signature = inspect.signature(fn)
+        fresh = float(os.getenv(f"TOOL_CACHE_TTL_{name.upper()}", ttl))
+        stale = float(os.getenv(f"TOOL_CACHE_STALE_{name.upper()}", stale_ttl))
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = {k: _normalize(v) for k, v in bound.arguments.items()}
+            if date_sensitive:
+                params["__date__"] = date.today().isoformat()
+            key = f"{name}:{json.dumps(params, sort_keys=True, default=str)}"
+            call = lambda: tool_cache.get_or_call(key, name, lambda: fn(*args, **kwargs), fresh, stale)
+            shared = shared_calls.get()
+            return await (shared.call(key, call) if shared is not None else call())
+
+        return wrapper
+
+    return decorator
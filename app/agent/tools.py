@@ -1,38 +1,71 @@
 import os
+import json
 import math
-import httpx
+import asyncio
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from langchain_core.tools import tool
+from langgraph.config import get_stream_writer
 from typing import Optional
+from app.agent.http_clients import http_clients
+from app.agent.geocoding import geocoder
+from app.agent.tool_cache import cached_tool
+from app.agent.ranking import rank_and_trim
+from app.agent.geo import HOTEL_INDEX_ENABLED, haversine_many, hotel_index
+from app.agent.gazetteer import GAZETTEER_AIRPORT_RADIUS_KM, GAZETTEER_ENABLED, gazetteer
 
 load_dotenv()
 
 
 async def get_geocode_locationiq(place):
-    url = "https://us1.locationiq.com/v1/search.php"
-    params = {"key": os.getenv("GEOLOCATION_IQ_API_KEY"), "q": place, "format": "json"}
-    async with httpx.AsyncClient() as client:
-        res = await client.get(url, params=params)
-        data = res.json()
-        if data:
-            return float(data[0]["lat"]), float(data[0]["lon"])
-        else:
-            return None
+    """Return (lat, lon) for a place via the shared, cached geocoder."""
+    return await geocoder.coordinates(place)
 
 
 async def location_bbox_search(place):
-    url = "https://us1.locationiq.com/v1/search.php"
-    params = {"key": os.getenv("GEOLOCATION_IQ_API_KEY"), "q": place, "format": "json"}
-    async with httpx.AsyncClient() as client:
-        res = await client.get(url, params=params)
-        data = res.json()
-        if data:
-            return data
-        else:
-            return None
+    """Return the raw LocationIQ result list for a place via the shared, cached geocoder."""
+    return await geocoder.search(place)
+
+
+# Bounds concurrent address lookups across all get_places calls in this process (LocationIQ limits
+# requests per second per key, so the bound is shared rather than per call)
+places_geocode_semaphore = asyncio.Semaphore(int(os.getenv("PLACES_GEOCODE_CONCURRENCY", "2")))
+
+
+def _place_coordinates(place):
+    """Coordinates supplied by Foursquare itself, if any."""
+    lat, lon = place.get("latitude"), place.get("longitude")
+    if lat is None or lon is None:
+        main = place.get("geocodes", {}).get("main", {})
+        lat, lon = main.get("latitude"), main.get("longitude")
+    if lat is None or lon is None:
+        return None
+    return float(lat), float(lon)
+
+
+async def _enrich_place(place):
+    address = place.get("location", {}).get("formatted_address")
+    coords = _place_coordinates(place)
+    if coords is None and address:
+        async with places_geocode_semaphore:
+            try:
+                coords = await get_geocode_locationiq(address)
+            except Exception:
+                coords = None
+    lat, lon = coords or (None, None)
+    return {
+        "name": place.get("name", "Unknown"),
+        "categories": [cat.get("name") for cat in place.get("categories", [])],
+        "address": address,
+        "latitude": lat,
+        "longitude": lon,
+        "phone": place.get("tel"),
+        "website": place.get("website")
+    }
+
 
 @tool
+@cached_tool(ttl=86400, stale_ttl=86400)
 async def get_places(city: str, query: str = "attractions") -> list:
     """
     Fetches top places (e.g., attractions, restaurants) in a city using the Foursquare Places API
@@ -59,27 +92,14 @@ async def get_places(city: str, query: str = "attractions") -> list:
     url = "https://places-api.foursquare.com/places/search"
     headers = {"accept": "application/json", "X-Places-Api-Version": "2025-06-17", "authorization": api_key}
     params = {"near": city, "query": query, "limit": 10}
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers, params=params)
-        if response.status_code != 200:
-            return [{"error": f"Foursquare API error: {response.text}"}]
-        results = response.json().get("results", [])
-        if not results:
-            return [{"message": f"No results found for '{query}' in {city}."}]
-        extracted = []
-        for place in results:
-            address = place['location']['formatted_address']
-            lat, lon = await get_geocode_locationiq(address)
-            extracted.append({
-                "name": place.get("name", "Unknown"),
-                "categories": [cat.get("name") for cat in place.get("categories", [])],
-                "address": address,
-                "latitude": lat,
-                "longitude": lon,
-                "phone": place.get("tel"),
-                "website": place.get("website")
-            })
-        return extracted
+    client = http_clients.get("foursquare")
+    response = await client.get(url, headers=headers, params=params)
+    if response.status_code != 200:
+        return [{"error": f"Foursquare API error: {response.text}"}]
+    results = response.json().get("results", [])
+    if not results:
+        return [{"message": f"No results found for '{query}' in {city}."}]
+    return list(await asyncio.gather(*[_enrich_place(place) for place in results]))
 
 
 def haversine_distance(lat1, lon1, lat2, lon2):
@@ -92,7 +112,57 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     return R * c
 
+HOTEL_PAGE_SIZE = int(os.getenv("HOTEL_PAGE_SIZE", "20"))
+HOTEL_MAX_PAGES = int(os.getenv("HOTEL_MAX_PAGES", "5"))
+
+# Bounds concurrent Booking page requests across all hotel searches
+hotel_page_semaphore = asyncio.Semaphore(int(os.getenv("HOTEL_PAGE_CONCURRENCY", "3")))
+
+
+def _stream_writer():
+    """LangGraph custom-stream writer when running inside the graph, else a no-op."""
+    try:
+        return get_stream_writer()
+    except (RuntimeError, KeyError):
+        return lambda _: None
+
+
+async def _fetch_hotel_page(index, url, headers, querystring, offset):
+    try:
+        async with hotel_page_semaphore:
+            client = http_clients.get("booking")
+            response = await client.get(url, headers=headers, params={**querystring, "offset": str(offset)})
+    except Exception as e:
+        return index, None, str(e)
+    if response.status_code != 200:
+        return index, None, response.text
+    return index, response.json().get("result", []), None
+
+
+async def _fetch_hotel_pages(url, headers, querystring, offsets):
+    """
+    Fetch Booking list-by-map pages concurrently. Progress is streamed as pages arrive;
+    results are merged in page order so the outcome does not depend on arrival order.
+    Also returns whether the fetch was exhaustive: no page failed and the last one was short, so
+    every hotel Booking has for the query was fetched.
+    """
+    write = _stream_writer()
+    pages, errors = {}, []
+    tasks = [_fetch_hotel_page(i, url, headers, querystring, o) for i, o in enumerate(offsets)]
+    for future in asyncio.as_completed(tasks):
+        index, page, error = await future
+        if error is not None:
+            errors.append(error)
+            continue
+        pages[index] = page
+        write({"tool": "get_hotels_by_area_and_radius", "pages_done": len(pages) + len(errors),
+               "pages": len(offsets), "hotels": sum(len(p) for p in pages.values())})
+    complete = not errors and len(pages[len(offsets) - 1]) < HOTEL_PAGE_SIZE
+    return [item for i in sorted(pages) for item in pages[i]], errors, complete
+
+
 @tool
+@cached_tool(ttl=300, stale_ttl=300, date_sensitive=True)
 async def get_hotels_by_area_and_radius(
     location: str,
     arrival_date: Optional[str] = None,
@@ -107,10 +177,11 @@ async def get_hotels_by_area_and_radius(
     categories_filter: str = "class::1,class::2,class::3",
     language: str = "en-us",
     travel_purpose: str = "leisure",
-    offset: int = 0
+    offset: int = 0,
+    pages: int = 1
 ) -> list:
     """
-    Fetch hotel listings within a location, sorted by distance to its center. If no dates are provided, use today's date as `arrival_date` and tomorrow's as `departure_date`.
+    Fetch hotel listings within a location, ranked by distance to its center, price and review score. If no dates are provided, use today's date as `arrival_date`; without a `departure_date` the stay is one night.
 
     Parameters:
         - location (str): The location to search for hotels, such as an area name, locality, or city (e.g., "Koramangala, Bangalore").
@@ -127,22 +198,32 @@ async def get_hotels_by_area_and_radius(
         - language (str): Response language
         - travel_purpose (str): "leisure" or "business"
         - offset (int): Pagination offset
+        - pages (int): Number of result pages to fetch concurrently from `offset` (use 2-5 for large areas like whole cities)
 
     Returns:
-        - list of hotel dicts sorted by ascending distance from bbox center.
+        - list of the top hotel dicts (HOTELS_TOP_K), best first; closer to the bbox center ranks higher.
     """
-    
-    res = await location_bbox_search(location)
-    bbox = ",".join(res[0]['boundingbox'])
-    
-    
+
     today = datetime.today()
     
     if not arrival_date:
         arrival_date = today.strftime("%Y-%m-%d")
+
+    try:
+        check_in = datetime.strptime(arrival_date, "%Y-%m-%d")
+        if departure_date:
+            datetime.strptime(departure_date, "%Y-%m-%d")
+    except ValueError:
+        return [{"error": f"Invalid date (expected YYYY-MM-DD): {arrival_date} / {departure_date}"}]
         
     if not departure_date:
-        departure_date = (today + timedelta(days=1)).strftime("%Y-%m-%d")
+        # One night from check-in (not from today: "hotels in Goa tomorrow" is tomorrow night)
+        departure_date = (check_in + timedelta(days=1)).strftime("%Y-%m-%d")
+
+    res = await location_bbox_search(location)
+    if not res:
+        return [{"error": f"Could not geocode location: {location}"}]
+    bbox = ",".join(res[0]['boundingbox'])
 
     categories_filter = ",".join([f"class::{s.strip()}" for s in star_rating.split(",")])
 
@@ -175,135 +256,174 @@ async def get_hotels_by_area_and_radius(
         "x-rapidapi-host": "apidojo-booking-v1.p.rapidapi.com"
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers, params=querystring)
-        if response.status_code != 200:
-            return [{"error": response.text}]
-
-        results = response.json().get("result", [])
-        hotels = []
-
-        for item in results:
-            if not item.get("class"):
-                continue
-            lat = item.get("latitude")
-            lng = item.get("longitude")
-            if lat is None or lng is None:
-                continue
-
-            distance_km = haversine_distance(center_lat, center_lng, lat, lng)
-            hotels.append({
-                "name": item.get("hotel_name"),
-                "star_rating": item.get("class"),
-                "review_score": item.get("review_score"),
-                "review_word": item.get("review_score_word"),
-                "review_count": item.get("review_nr"),
-                "address": item.get("address"),
-                "city": item.get("city"),
-                "district": item.get("district"),
-                "latitude": lat,
-                "longitude": lng,
-                "price_per_night": item.get("min_total_price") or item.get("price_breakdown", {}).get("all_inclusive_price"),
-                "currency": item.get("currencycode", currency),
-                "image": item.get("main_photo_url"),
-                "booking_url": item.get("url"),
-                "is_free_cancellable": item.get("is_free_cancellable"),
-                "is_mobile_deal": item.get("is_mobile_deal"),
-                "checkin_from": item.get("checkin", {}).get("from"),
-                "checkout_until": item.get("checkout", {}).get("until"),
-                "arrival_date": arrival_date,
-                "departure_date": departure_date,
-                "distance_km": round(distance_km, 2)
-            })
+    # Everything except the area and page decides which hotels and prices come back
+    signature = json.dumps({k: v for k, v in querystring.items() if k not in ("bbox", "offset", "search_id")}, sort_keys=True)
+    if HOTEL_INDEX_ENABLED and offset == 0:
+        # A covered bbox was fetched exhaustively, so this answers any `pages`
+        indexed = hotel_index.in_bbox(signature, (min_lat, max_lat, min_lng, max_lng))
+        if indexed:
+            return rank_and_trim("get_hotels_by_area_and_radius", indexed)
+
+    offsets = [offset + i * HOTEL_PAGE_SIZE for i in range(max(1, min(pages, HOTEL_MAX_PAGES)))]
+    results, errors, complete = await _fetch_hotel_pages(url, headers, querystring, offsets)
+    if errors and not results:
+        return [{"error": errors[0]}]
+
+    # Pages can overlap when listings shift between requests; keep the first occurrence of each hotel
+    seen = set()
+    items = []
+    for item in results:
+        key = item.get("hotel_id")
+        if key is None:
+            key = (item.get("latitude"), item.get("longitude"), item.get("hotel_name"))
+        if key in seen or not item.get("class") or item.get("latitude") is None or item.get("longitude") is None:
+            continue
+        seen.add(key)
+        items.append(item)
+    distances = haversine_many(center_lat, center_lng, [i["latitude"] for i in items], [i["longitude"] for i in items])
+    hotels = []
 
-        hotels.sort(key=lambda h: h["distance_km"])
-        return hotels
+    for item, distance_km in zip(items, distances):
+        lat = item["latitude"]
+        lng = item["longitude"]
+        hotels.append({
+            "hotel_id": item.get("hotel_id"),
+            "name": item.get("hotel_name"),
+            "star_rating": item.get("class"),
+            "review_score": item.get("review_score"),
+            "review_word": item.get("review_score_word"),
+            "review_count": item.get("review_nr"),
+            "address": item.get("address"),
+            "city": item.get("city"),
+            "district": item.get("district"),
+            "latitude": lat,
+            "longitude": lng,
+            "price_per_night": item.get("min_total_price") or item.get("price_breakdown", {}).get("all_inclusive_price"),
+            "currency": item.get("currencycode", currency),
+            "image": item.get("main_photo_url"),
+            "booking_url": item.get("url"),
+            "is_free_cancellable": item.get("is_free_cancellable"),
+            "is_mobile_deal": item.get("is_mobile_deal"),
+            "checkin_from": item.get("checkin", {}).get("from"),
+            "checkout_until": item.get("checkout", {}).get("until"),
+            "arrival_date": arrival_date,
+            "departure_date": departure_date,
+            "distance_km": round(float(distance_km), 2)
+        })
+
+    if HOTEL_INDEX_ENABLED and offset == 0 and complete:
+        hotel_index.add(signature, (min_lat, max_lat, min_lng, max_lng), hotels)
+
+    return rank_and_trim("get_hotels_by_area_and_radius", hotels)
 
 
 @tool
+@cached_tool(ttl=600, stale_ttl=300)
 async def get_weather(city: str) -> dict:
     """Get detailed current weather data for a city as a dictionary."""
     
     api_key = os.getenv("OPENWEATHER_API_KEY")
     url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=metric"
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        if response.status_code != 200:
-            return {"error": f"Failed to get weather: {response.text}"}
-        data = response.json()
-        lat, lon = await get_geocode_locationiq(city)
-        return {
-            "city": data.get("name"),
-            "country": data.get("sys", {}).get("country"),
-            "description": data.get("weather", [{}])[0].get("description"),
-            "temperature_celsius": data.get("main", {}).get("temp"),
-            "feels_like_celsius": data.get("main", {}).get("feels_like"),
-            "temp_min": data.get("main", {}).get("temp_min"),
-            "temp_max": data.get("main", {}).get("temp_max"),
-            "humidity": data.get("main", {}).get("humidity"),
-            "pressure": data.get("main", {}).get("pressure"),
-            "wind_speed_mps": data.get("wind", {}).get("speed"),
-            "wind_deg": data.get("wind", {}).get("deg"),
-            "visibility_m": data.get("visibility"),
-            "cloud_coverage_percent": data.get("clouds", {}).get("all"),
-            "sunrise_utc": data.get("sys", {}).get("sunrise"),
-            "sunset_utc": data.get("sys", {}).get("sunset"),
-            "icon": data.get("weather", [{}])[0].get("icon"),
-            "latitude": lat,
-            "longitude": lon
-        }
+    client = http_clients.get("openweather")
+    response = await client.get(url)
+    if response.status_code != 200:
+        return {"error": f"Failed to get weather: {response.text}"}
+    data = response.json()
+    # OpenWeather returns the coordinates it resolved; geocode only if they are missing
+    coord = data.get("coord") or {}
+    lat, lon = coord.get("lat"), coord.get("lon")
+    if lat is None or lon is None:
+        lat, lon = await get_geocode_locationiq(city) or (None, None)
+    return {
+        "city": data.get("name"),
+        "country": data.get("sys", {}).get("country"),
+        "description": data.get("weather", [{}])[0].get("description"),
+        "temperature_celsius": data.get("main", {}).get("temp"),
+        "feels_like_celsius": data.get("main", {}).get("feels_like"),
+        "temp_min": data.get("main", {}).get("temp_min"),
+        "temp_max": data.get("main", {}).get("temp_max"),
+        "humidity": data.get("main", {}).get("humidity"),
+        "pressure": data.get("main", {}).get("pressure"),
+        "wind_speed_mps": data.get("wind", {}).get("speed"),
+        "wind_deg": data.get("wind", {}).get("deg"),
+        "visibility_m": data.get("visibility"),
+        "cloud_coverage_percent": data.get("clouds", {}).get("all"),
+        "sunrise_utc": data.get("sys", {}).get("sunrise"),
+        "sunset_utc": data.get("sys", {}).get("sunset"),
+        "icon": data.get("weather", [{}])[0].get("icon"),
+        "latitude": lat,
+        "longitude": lon
+    }
+
+
+async def airport_code(place):
+    """
+    IATA code for an airport code or a place name: from the bundled gazetteer when it knows the
+    city, else the airport nearest to the geocoded place. Returned unchanged if neither works.
+    """
+    if not GAZETTEER_ENABLED:
+        return place
+    code = gazetteer.iata(place)
+    if code:
+        return code
+    coords = await get_geocode_locationiq(place)
+    nearest = gazetteer.nearest_airports(*coords, max_km=GAZETTEER_AIRPORT_RADIUS_KM) if coords else []
+    return nearest[0][0]["iata"] if nearest else place
 
 
 @tool
+@cached_tool(ttl=300, stale_ttl=300)
 async def get_flight_fares(from_code: str, to_code: str, date: str, adult: int = 1, type_: str = "economy") -> list:
     """
     Fetches flight fare data using the Flight Fare Search API on RapidAPI.
 
     Args:
-        from_code (str): IATA code of departure airport (e.g., 'BLR')
-        to_code (str): IATA code of arrival airport (e.g., 'CCU')
+        from_code (str): IATA code of departure airport (e.g., 'BLR'); a city name also works (e.g., 'Bangalore')
+        to_code (str): IATA code of arrival airport (e.g., 'CCU'); a city name also works (e.g., 'Kolkata')
         date (str): Travel date in YYYY-MM-DD
         adult (int): Number of adult passengers (default: 1)
         type_ (str): Cabin class (default: 'economy')
 
     Returns:
-        list: List of flights with key details: timing, pricing, stops, countries, and cabin info.
+        list: The top flights (FLIGHTS_TOP_K) ranked by price, stops and duration, with key details:
+              timing, pricing, stops, countries, and cabin info.
     """
     
+    from_code, to_code = await asyncio.gather(airport_code(from_code), airport_code(to_code))
     url = "https://flight-fare-search.p.rapidapi.com/v2/flights"
     querystring = {"from": from_code, "to": to_code, "date": date, "adult": str(adult), "type": type_, "currency": "USD"}
     headers = {
         "x-rapidapi-key": os.getenv("RAPIDAPI_KEY_FLIGHTS"),
         "x-rapidapi-host": "flight-fare-search.p.rapidapi.com"
     }
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers, params=querystring)
-        try:
-            raw = response.json()
-            flights = raw.get("results", [])
-            if not isinstance(flights, list) or not flights:
-                return [{"message": "No flights found."}]
-            results = []
-            for f in flights:
-                stop_summary = f.get("stopSummary", {})
-                stop_info = [{"intermediate_airport": val.get("airport", "Unknown"), "stop_duration_minutes": val.get("stopDuration")}
-                                for key, val in stop_summary.items() if key != "connectingTime" and isinstance(val, dict)]
-                results.append({
-                    "flight_code": f.get("flight_code"),
-                    "airline": f.get("flight_name"),
-                    "cabin_type": f.get("cabinType", "Unknown"),
-                    "stops": f.get("stops", "Unknown"),
-                    "departure_city": f.get("departureAirport", {}).get("city"),
-                    "departure_country": f.get("departureAirport", {}).get("country", {}).get("label"),
-                    "departure_time": f.get("departureAirport", {}).get("time"),
-                    "arrival_city": f.get("arrivalAirport", {}).get("city"),
-                    "arrival_country": f.get("arrivalAirport", {}).get("country", {}).get("label"),
-                    "arrival_time": f.get("arrivalAirport", {}).get("time"),
-                    "duration": f.get("duration", {}).get("text"),
-                    "price": f.get("totals", {}).get("total"),
-                    "currency": f.get("totals", {}).get("currency"),
-                    "intermediate_stops": stop_info if stop_info else None
-                })
-            return results
-        except Exception as e:
-            return [{"error": str(e)}]
\ No newline at end of file
+    client = http_clients.get("flights")
+    response = await client.get(url, headers=headers, params=querystring)
+    try:
+        raw = response.json()
+        flights = raw.get("results", [])
+        if not isinstance(flights, list) or not flights:
+            return [{"message": "No flights found."}]
+        results = []
+        for f in flights:
+            stop_summary = f.get("stopSummary", {})
+            stop_info = [{"intermediate_airport": val.get("airport", "Unknown"), "stop_duration_minutes": val.get("stopDuration")}
+                            for key, val in stop_summary.items() if key != "connectingTime" and isinstance(val, dict)]
+            results.append({
+                "flight_code": f.get("flight_code"),
+                "airline": f.get("flight_name"),
+                "cabin_type": f.get("cabinType", "Unknown"),
+                "stops": f.get("stops", "Unknown"),
+                "departure_city": f.get("departureAirport", {}).get("city"),
+                "departure_country": f.get("departureAirport", {}).get("country", {}).get("label"),
+                "departure_time": f.get("departureAirport", {}).get("time"),
+                "arrival_city": f.get("arrivalAirport", {}).get("city"),
+                "arrival_country": f.get("arrivalAirport", {}).get("country", {}).get("label"),
+                "arrival_time": f.get("arrivalAirport", {}).get("time"),
+                "duration": f.get("duration", {}).get("text"),
+                "price": f.get("totals", {}).get("total"),
+                "currency": f.get("totals", {}).get("currency"),
+                "intermediate_stops": stop_info if stop_info else None
+            })
+        return rank_and_trim("get_flight_fares", results)
+    except Exception as e:
+        return [{"error": str(e)}]
\ No newline at end of file
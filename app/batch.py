@@ -0,0 +1,90 @@
+import os
+import time
+import asyncio
+from app.agent.response_cache import normalize_message
+from app.agent.tool_cache import SharedCalls, shared_calls
+from app.agent.telemetry import metrics, percentile
+
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+# Items of one batch planned at once (a request may ask for fewer, or more up to BATCH_MAX_PARALLELISM)
+BATCH_PARALLELISM = int(os.getenv("BATCH_PARALLELISM", "8"))
+BATCH_MAX_PARALLELISM = int(os.getenv("BATCH_MAX_PARALLELISM", "32"))
+
+metrics.describe("travel_batch_items_total", "counter", "Batch items finished, by status")
+
+
+async def run_batch(items, plan, parallelism=BATCH_PARALLELISM):
+    """
+    Plan every item ({"id", "message"}) with `plan(message, index)`, which returns the "done" data of
+    trip_events, at most `parallelism` at a time. Yields one result per item as soon as it is ready,
+    in completion order, then a summary with throughput and latency percentiles.
+
+    Work is shared across the batch: items with the same (normalized) message are planned once (the
+    copies are marked "deduplicated" and carry the call counts of that one run), and identical tool
+    calls and geocoding lookups made by different items run once (SharedCalls).
+    """
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(parallelism)
+    shared = SharedCalls()
+
+    groups = {}
+    for index, item in enumerate(items):
+        groups.setdefault(normalize_message(item["message"]), []).append(index)
+
+    async def plan_group(indexes):
+        # Per task context: the shared calls apply to this batch's items only
+        shared_calls.set(shared)
+        async with semaphore:
+            began = time.perf_counter()
+            try:
+                data = await plan(items[indexes[0]]["message"], indexes[0])
+                status = "timed_out" if data.get("timed_out") else "done"
+            except Exception as e:
+                data, status = {"response": f"Error: {e}"}, "error"
+            return indexes, status, data, began - started, time.perf_counter() - began
+
+    tasks = [asyncio.create_task(plan_group(indexes)) for indexes in groups.values()]
+    latencies, statuses = [], {"done": 0, "timed_out": 0, "error": 0}
+    try:
+        for future in asyncio.as_completed(tasks):
+            indexes, status, data, queued, seconds = await future
+            timings = data.get("timings") or {}
+            for n, index in enumerate(indexes):
+                latencies.append(seconds)
+                statuses[status] += 1
+                metrics.inc("travel_batch_items_total", {"status": status})
+                yield {
+                    "type": "item",
+                    "index": index,
+                    "id": items[index].get("id"),
+                    "status": status,
+                    "response": data.get("response"),
+                    "cached": data.get("cached", False),
+                    "deduplicated": n > 0,
+                    "queued_seconds": round(queued, 4),
+                    "seconds": round(seconds, 4),
+                    "llm_calls": len(timings.get("llm_calls", [])),
+                    "upstream_calls": len(timings.get("http_calls", [])),
+                    "tokens": timings.get("prompt_tokens", 0) + timings.get("completion_tokens", 0),
+                }
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    elapsed = time.perf_counter() - started
+    yield {
+        "type": "summary",
+        "items": len(items),
+        "planned": len(groups),
+        **statuses,
+        "parallelism": parallelism,
+        "seconds": round(elapsed, 4),
+        "throughput_per_second": round(len(items) / elapsed, 2) if elapsed else None,
+        "latency_seconds": {
+            "p50": round(percentile(latencies, 50), 4),
+            "p95": round(percentile(latencies, 95), 4),
+            "max": round(max(latencies), 4),
+        } if latencies else None,
+        "shared_calls": shared.counters,
+    }
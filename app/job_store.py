@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+def _limit_result(job, max_result_bytes):
+    """Truncate an oversized response so one job cannot dominate the store."""
+    response = job.get("response")
+    if isinstance(response, str) and len(response.encode()) > max_result_bytes:
+        truncated = response.encode()[:max_result_bytes].decode(errors="ignore")
+        job = {**job, "response": truncated, "truncated": True}
+    return job
+
+
+class JobStore(ABC):
+    """
+    Interface for job state shared between `/start-plan-trip`, the background task and
+    `/get-response/{job_id}`. Jobs are plain JSON-serializable dicts.
+    """
+
+    def __init__(self, ttl=3600, max_jobs=10000, max_result_bytes=256 * 1024):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.max_result_bytes = max_result_bytes
+
+    @abstractmethod
+    async def get(self, job_id):
+        ...
+
+    @abstractmethod
+    async def set(self, job_id, job):
+        ...
+
+    @abstractmethod
+    async def stats(self):
+        ...
+
+
+class MemoryJobStore(JobStore):
+    """Per-process store with TTL and max-size (oldest first) eviction."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.jobs = OrderedDict()
+        self.bytes = 0
+        self.evicted = 0
+
+    def _remove(self, job_id):
+        job, _, size = self.jobs.pop(job_id)
+        self.bytes -= size
+        return job
+
+    def _evict(self):
+        now = time.time()
+        while self.jobs:
+            job_id, (_, expires_at, _) = next(iter(self.jobs.items()))
+            if expires_at >= now and len(self.jobs) <= self.max_jobs:
+                break
+            self._remove(job_id)
+            self.evicted += 1
+
+    async def get(self, job_id):
+        entry = self.jobs.get(job_id)
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry[0]
+
+    async def set(self, job_id, job):
+        job = _limit_result(job, self.max_result_bytes)
+        if job_id in self.jobs:
+            self._remove(job_id)
+        size = len(json.dumps(job).encode())
+        self.jobs[job_id] = (job, time.time() + self.ttl, size)
+        self.bytes += size
+        self._evict()
+
+    async def stats(self):
+        self._evict()
+        return {"backend": "memory", "jobs": len(self.jobs), "max_jobs": self.max_jobs,
+                "bytes": self.bytes, "evicted": self.evicted}
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Store shared by every uvicorn worker on the host (and surviving restarts).
+    Expired rows and rows beyond `max_jobs` (least recently updated first) are deleted on write.
+    """
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, data TEXT, expires_at REAL, updated_at REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM jobs WHERE id = ? AND expires_at >= ?", (job_id, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set(self, job_id, job):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?)", (job_id, json.dumps(job), now + self.ttl, now))
+            conn.execute("DELETE FROM jobs WHERE expires_at < ?", (now,))
+            conn.execute("DELETE FROM jobs WHERE id IN (SELECT id FROM jobs ORDER BY updated_at DESC LIMIT -1 OFFSET ?)", (self.max_jobs,))
+
+    def _stats(self):
+        with self._connect() as conn:
+            count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM jobs WHERE expires_at >= ?", (time.time(),)).fetchone()
+        return {"backend": "sqlite", "jobs": count, "max_jobs": self.max_jobs, "bytes": size,
+                "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0}
+
+    async def get(self, job_id):
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def set(self, job_id, job):
+        await asyncio.to_thread(self._set, job_id, _limit_result(job, self.max_result_bytes))
+
+    async def stats(self):
+        return await asyncio.to_thread(self._stats)
+
+
+def create_job_store():
+    """Build the store selected by JOB_STORE ("memory" or "sqlite")."""
+    options = {
+        "ttl": float(os.getenv("JOB_TTL", "3600")),
+        "max_jobs": int(os.getenv("JOB_MAX_JOBS", "10000")),
+        "max_result_bytes": int(os.getenv("JOB_MAX_RESULT_BYTES", str(256 * 1024))),
+    }
+    if os.getenv("JOB_STORE", "memory") == "sqlite":
+        return SQLiteJobStore(os.getenv("JOB_STORE_PATH", "jobs.db"), **options)
+    return MemoryJobStore(**options)
@@ -1,20 +1,64 @@
 import os
+import sys
 os.environ.pop("SSL_CERT_FILE", None)
 
-from fastapi import FastAPI, BackgroundTasks
-from fastapi.responses import FileResponse
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Optional
 from uuid import uuid4
-from app.agent.graph import app as travel_graph
-from langchain_core.messages import HumanMessage
+import json
+from dotenv import load_dotenv
 
+# Loaded once, before any app module reads its settings from the environment at import time
+load_dotenv()
 
-# Memory store for jobs (in-memory dict for now)
-jobs = {}
+# The graph (and with it langgraph, langchain and the OpenAI client) is imported by the warmup,
+# not here: importing app.main stays fast and the worker answers /healthz while it warms up
+from app.agent.http_clients import http_clients
+from app.agent.geocoding import geocoder
+from app.agent.response_cache import response_cache
+from app.agent.tool_cache import shared_calls, tool_cache
+from app.agent.ranking import trim_stats
+from app.agent.fast_router import router_stats
+from app.agent.gazetteer import gazetteer
+from app.agent.telemetry import metrics
+from app.agent.rate_limit import rate_limiter
+from app.job_store import create_job_store
+from app.scheduler import QueueFull, create_scheduler
+from app.warmup import warmup
+from app.batch import BATCH_MAX_ITEMS, BATCH_MAX_PARALLELISM, BATCH_PARALLELISM, run_batch
 
 
-app = FastAPI()
+# Job state store: in-memory by default, JOB_STORE=sqlite to share it across workers
+job_store = create_job_store()
+
+
+async def mark_cancelled(job_id: str):
+    await job_store.set(job_id, {"status": "cancelled", "response": "Cancelled: the client stopped polling for this job."})
+
+
+# Bounded worker pool for trip jobs (JOB_WORKERS running, JOB_QUEUE_SIZE waiting)
+scheduler = create_scheduler(on_cancel=mark_cancelled)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the pooled upstream clients once per process and reuse them across requests
+    await http_clients.start()
+    await scheduler.start()
+    # Graph import, agents, checkpointer, upstream connections: in the background, see /readyz
+    warmup.start()
+    yield
+    await warmup.aclose()
+    await scheduler.stop()
+    await http_clients.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 app.add_middleware(
@@ -28,47 +72,227 @@ app.add_middleware(
 
 class TravelQuery(BaseModel):
     message: str
+    # Continue an earlier conversation (the thread_id returned by /start-plan-trip); a new one if omitted
+    thread_id: Optional[str] = Field(default=None, max_length=128)
+
+
+class BatchItem(BaseModel):
+    message: str
+    # Echoed back on the item's result line
+    id: Optional[str] = None
+
 
+class BatchQuery(BaseModel):
+    queries: list[BatchItem] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+    parallelism: Optional[int] = Field(default=None, ge=1, le=BATCH_MAX_PARALLELISM)
 
-# Background processing task
-async def process_trip(job_id: str, message: str):
+
+def new_thread_id():
+    return f"user-{uuid4()}"
+
+
+def client_id_of(request: Request):
+    """Client a job is queued for (round-robin fairness): X-Client-Id, else the peer address."""
+    return request.headers.get("x-client-id") or (request.client.host if request.client else "anonymous")
+
+
+QUEUE_FULL = HTTPException(status_code=429, detail="Too many trip requests queued, retry later.", headers={"Retry-After": "5"})
+
+# Seconds between keep-alive comments on an idle event stream (also keeps a queued stream's job alive)
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", "15"))
+
+
+async def run_trip(message: str, thread_id: str, persist: bool = True):
+    """trip_events on the travel graph; a request that arrives before warmup is done waits for it."""
+    graph = await warmup.wait()
+    from app.agent.streaming import trip_events
+    async for event, data in trip_events(graph, message, thread_id, persist=persist):
+        yield event, data
+
+
+# Background processing task, run by the scheduler's worker pool
+async def process_trip(job_id: str, message: str, thread_id: str):
+    await job_store.set(job_id, {"status": "processing", "response": None})
     try:
-        stream = travel_graph.astream(
-            {"messages": [HumanMessage(content=message)]},
-            config={"configurable": {"thread_id": f"user-{job_id}"}},
-            stream_mode="values"
-        )
-
-        result = []
-        async for event in stream:
-            content = event["messages"][-1].content
-            if content:
-                result.append(content)
-
-        jobs[job_id] = {"status": "done", "response": result[-1] if result else "No response."}
-        
+        async for event, data in run_trip(message, thread_id):
+            if event == "done":
+                await job_store.set(job_id, {"status": "done", "response": data["response"], "timings": data["timings"]})
+
     except Exception as e:
-        jobs[job_id] = {"status": "error", "response": f"Error: {str(e)}"}
+        await job_store.set(job_id, {"status": "error", "response": f"Error: {str(e)}"})
 
 
-# POST to start trip planning
+# POST to start trip planning; 429 when the job queue is full
 @app.post("/start-plan-trip")
-async def start_trip(query: TravelQuery, bg: BackgroundTasks):
+async def start_trip(query: TravelQuery, request: Request):
     job_id = str(uuid4())
-    jobs[job_id] = {"status": "processing", "response": None}
-    bg.add_task(process_trip, job_id, query.message)
-    return {"job_id": job_id}
+    thread_id = query.thread_id or new_thread_id()
+    await job_store.set(job_id, {"status": "queued", "response": None})
+    try:
+        await scheduler.submit(job_id, client_id_of(request), lambda: process_trip(job_id, query.message, thread_id))
+    except QueueFull:
+        await job_store.set(job_id, {"status": "rejected", "response": "Too many trip requests queued."})
+        raise QUEUE_FULL
+    return {"job_id": job_id, "thread_id": thread_id, "position": scheduler.position(job_id)}
+
+
+# Batch of trip queries (e.g. one weekend across many cities): planned concurrently, results
+# streamed back as NDJSON as each finishes, then a summary line (throughput, latency percentiles).
+# Items run on the same worker pool as the other trip endpoints, queued as one client; 429 when
+# the queue cannot take the batch's first round of items
+@app.post("/batch-plan-trip")
+async def batch_trip(batch: BatchQuery, request: Request):
+    batch_id = uuid4().hex[:12]
+    client_id = client_id_of(request)
+    parallelism = batch.parallelism or BATCH_PARALLELISM
+    if not scheduler.has_room(min(parallelism, len(batch.queries))):
+        raise QUEUE_FULL
+
+    async def plan(message: str, index: int):
+        job_id = f"batch-{batch_id}-{index}"
+        shared = shared_calls.get()
+        planned = asyncio.get_running_loop().create_future()
+
+        async def job():
+            # Runs in the worker's context: carry the batch's shared calls over
+            shared_calls.set(shared)
+            try:
+                # One-off queries: their threads are deleted once planned ("done" is the last event,
+                # so running the generator to its end also runs that cleanup)
+                result = {"response": "No response."}
+                async for event, data in run_trip(message, job_id, persist=False):
+                    if event == "done":
+                        result = data
+                planned.set_result(result)
+            except Exception as e:
+                planned.set_exception(e)
+            finally:
+                if not planned.done():
+                    planned.set_exception(RuntimeError("Cancelled by the scheduler."))
+
+        try:
+            await scheduler.submit(job_id, client_id, job)
+        except QueueFull:
+            raise QueueFull("Too many trip requests queued, retry later.")
+        try:
+            while not planned.done():
+                # Queued items count as polled: the reaper only cancels jobs nobody waits for
+                await asyncio.wait({planned}, timeout=SSE_KEEPALIVE)
+                scheduler.touch(job_id)
+            return planned.result()
+        finally:
+            # The client disconnected: free the item's worker or queue slot
+            await scheduler.cancel(job_id)
+
+    async def lines():
+        items = [item.model_dump() for item in batch.queries]
+        async for result in run_batch(items, plan, parallelism):
+            yield json.dumps({"batch_id": batch_id, **result}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
 
 
 # Polling endpoint
 @app.get("/get-response/{job_id}")
 async def get_result(job_id: str):
-    job = jobs.get(job_id)
+    scheduler.touch(job_id)
+    job = await job_store.get(job_id)
     if not job:
         return {"status": "not_found", "response": "Invalid job ID."}
+    position = scheduler.position(job_id)
+    if position is not None:
+        return {**job, "status": "queued", "position": position}
     return job
 
 
+# Streaming endpoint (Server-Sent Events): routing decisions, LLM tokens and expert outputs as they happen.
+# Runs on the same worker pool as /start-plan-trip: "queued" with the position first, 429 when the queue is full
+@app.get("/stream-plan-trip")
+async def stream_trip(message: str, request: Request, thread_id: Optional[str] = Query(default=None, max_length=128)):
+    job_id = str(uuid4())
+    events = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for item in run_trip(message, thread_id or new_thread_id()):
+                events.put_nowait(item)
+        except Exception as e:
+            events.put_nowait(("error", {"response": f"Error: {str(e)}"}))
+        finally:
+            events.put_nowait(None)
+
+    try:
+        await scheduler.submit(job_id, client_id_of(request), produce)
+    except QueueFull:
+        raise QUEUE_FULL
+
+    async def event_stream():
+        try:
+            yield f"event: queued\ndata: {json.dumps({'position': scheduler.position(job_id)})}\n\n"
+            while True:
+                try:
+                    item = await asyncio.wait_for(events.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    scheduler.touch(job_id)
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is None:
+                    break
+                scheduler.touch(job_id)
+                event, data = item
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            # The client disconnected (or the job finished): free its worker or queue slot
+            await scheduler.cancel(job_id)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# Liveness: the process is up and its event loop responds
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+# Readiness: 200 once warmup is done, 503 while warming up, after a failed warmup and when shutting down
+@app.get("/readyz")
+async def readyz():
+    status = 200 if warmup.ready else 503
+    return JSONResponse({"ready": warmup.ready, **warmup.stats()}, status_code=status)
+
+
+# Runtime statistics (scheduler, job store, connection pools, caches) for sizing
+@app.get("/stats")
+async def get_stats():
+    # Graph-side modules are only there once warmup has imported them
+    agent, geo = sys.modules.get("app.agent.agent"), sys.modules.get("app.agent.geo")
+    return {
+        "warmup": warmup.stats(),
+        "scheduler": scheduler.stats(),
+        "router": router_stats.stats(),
+        "experts": agent.expert_stats if agent else {},
+        "jobs": await job_store.stats(),
+        "http_pools": http_clients.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "geocode_cache": geocoder.stats(),
+        "gazetteer": gazetteer.stats(),
+        "response_cache": response_cache.stats(),
+        "tool_cache": tool_cache.stats(),
+        "result_trimming": trim_stats,
+        "hotel_index": geo.hotel_index.stats() if geo else {},
+    }
+
+
+# Prometheus text exposition: node, LLM (latency, tokens) and upstream HTTP metrics, cache hit rates
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # Serve frontend
 @app.get("/")
 def serve_ui():
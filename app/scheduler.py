@@ -0,0 +1,169 @@
+import os
+import time
+import asyncio
+from collections import deque
+
+
+class QueueFull(Exception):
+    """Raised by `JobScheduler.submit` when the queue is at capacity."""
+
+
+class JobScheduler:
+    """
+    Bounded worker pool for trip jobs, polled (/start-plan-trip) or streamed (/stream-plan-trip).
+
+    - At most `workers` jobs run at once; up to `max_queue` more wait in line.
+    - Waiting jobs are dispatched round-robin across clients, so one client's burst
+      cannot starve everyone else.
+    - Jobs whose client has not polled for `abandon_after` seconds are cancelled,
+      whether still queued or already running.
+    """
+
+    def __init__(self, workers=4, max_queue=100, abandon_after=120, on_cancel=None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.abandon_after = abandon_after
+        self.on_cancel = on_cancel
+        self.queues = {}
+        self.order = deque()
+        self.running = {}
+        self.last_seen = {}
+        self.ready = asyncio.Condition()
+        self.tasks = []
+        self.counters = {"submitted": 0, "rejected": 0, "completed": 0, "cancelled": 0}
+
+    @property
+    def queued(self):
+        return sum(len(q) for q in self.queues.values())
+
+    async def start(self):
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if self.abandon_after:
+            self.tasks.append(asyncio.create_task(self._reaper()))
+
+    async def stop(self):
+        for task in self.tasks + list(self.running.values()):
+            task.cancel()
+        await asyncio.gather(*self.tasks, *self.running.values(), return_exceptions=True)
+        self.tasks = []
+
+    async def submit(self, job_id, client_id, fn):
+        """Queue `fn()` (a coroutine factory) for `client_id`; raises QueueFull when at capacity."""
+        if self.queued >= self.max_queue:
+            self.counters["rejected"] += 1
+            raise QueueFull()
+        async with self.ready:
+            if client_id not in self.queues:
+                self.queues[client_id] = deque()
+                self.order.append(client_id)
+            self.queues[client_id].append((job_id, fn))
+            self.last_seen[job_id] = time.time()
+            self.counters["submitted"] += 1
+            self.ready.notify()
+
+    def has_room(self, jobs):
+        """True if `jobs` more jobs can be queued now."""
+        return self.queued + jobs <= self.max_queue
+
+    def touch(self, job_id):
+        """Record that the job's client is still waiting for it."""
+        if job_id in self.last_seen:
+            self.last_seen[job_id] = time.time()
+
+    def position(self, job_id):
+        """1-based position in the dispatch order, or None if the job is not queued here."""
+        queues = [self.queues[c] for c in self.order]
+        position = 0
+        for depth in range(max((len(q) for q in queues), default=0)):
+            for q in queues:
+                if depth < len(q):
+                    position += 1
+                    if q[depth][0] == job_id:
+                        return position
+        return None
+
+    async def _next(self):
+        async with self.ready:
+            while not self.order:
+                await self.ready.wait()
+            client_id = self.order.popleft()
+            queue = self.queues[client_id]
+            job = queue.popleft()
+            if queue:
+                self.order.append(client_id)
+            else:
+                del self.queues[client_id]
+            return job
+
+    async def _worker(self):
+        while True:
+            job_id, fn = await self._next()
+            task = asyncio.ensure_future(fn())
+            self.running[job_id] = task
+            try:
+                await task
+                self.counters["completed"] += 1
+            except asyncio.CancelledError:
+                # Only a job cancelled on its own (cancel, reaper) is swallowed; the worker being
+                # stopped (which cancels the job it awaits too) must end
+                if asyncio.current_task().cancelling() or not task.cancelled():
+                    raise
+            finally:
+                self.running.pop(job_id, None)
+                self.last_seen.pop(job_id, None)
+
+    async def _cancel(self, job_id):
+        self.counters["cancelled"] += 1
+        self.last_seen.pop(job_id, None)
+        if self.on_cancel:
+            await self.on_cancel(job_id)
+
+    def _unqueue(self, job_ids):
+        """Remove `job_ids` from the waiting queues (caller holds `ready`)."""
+        for client_id in list(self.order):
+            queue = deque(job for job in self.queues[client_id] if job[0] not in job_ids)
+            if queue:
+                self.queues[client_id] = queue
+            else:
+                del self.queues[client_id]
+                self.order.remove(client_id)
+
+    async def cancel(self, job_id):
+        """Cancel a job whether queued or running (its client went away); no-op once it finished."""
+        task = self.running.get(job_id)
+        if job_id not in self.last_seen or task is not None and task.done():
+            return
+        async with self.ready:
+            self._unqueue({job_id})
+        if task is not None:
+            task.cancel()
+        self.counters["cancelled"] += 1
+        self.last_seen.pop(job_id, None)
+
+    async def _reaper(self):
+        while True:
+            await asyncio.sleep(min(5, self.abandon_after))
+            cutoff = time.time() - self.abandon_after
+            abandoned = {job_id for job_id, seen in self.last_seen.items() if seen < cutoff}
+            if not abandoned:
+                continue
+            async with self.ready:
+                self._unqueue(abandoned)
+            for job_id in abandoned:
+                task = self.running.get(job_id)
+                if task is not None:
+                    task.cancel()
+                await self._cancel(job_id)
+
+    def stats(self):
+        return {**self.counters, "workers": self.workers, "running": len(self.running),
+                "queued": self.queued, "max_queue": self.max_queue, "clients_waiting": len(self.order)}
+
+
+def create_scheduler(on_cancel=None):
+    return JobScheduler(
+        workers=int(os.getenv("JOB_WORKERS", "4")),
+        max_queue=int(os.getenv("JOB_QUEUE_SIZE", "100")),
+        abandon_after=float(os.getenv("JOB_ABANDON_AFTER", "120")),
+        on_cancel=on_cancel,
+    )
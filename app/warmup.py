@@ -0,0 +1,130 @@
+import os
+import time
+import asyncio
+import importlib
+
+
+# Open one connection per upstream during warmup (no API call is made)
+WARMUP_CONNECTIONS = os.getenv("WARMUP_CONNECTIONS", "1").lower() not in ("0", "false", "no")
+# Also send a one-token completion, so the first request does not pay for the LLM's TLS handshake
+WARMUP_LLM_PING = os.getenv("WARMUP_LLM_PING", "0").lower() in ("1", "true", "yes")
+WARMUP_STEP_TIMEOUT = float(os.getenv("WARMUP_STEP_TIMEOUT", "10"))
+
+
+class Warmup:
+    """
+    Gets a worker ready for traffic after it starts: imports the graph (langgraph, langchain and the
+    OpenAI client are only imported here, not when app.main is imported), builds the agents, opens
+    the checkpointer and upstream connections, and loads the tokenizer and templates.
+
+    Runs in the background from the lifespan so /healthz answers at once; /readyz turns 200 when it
+    is done. Requests that arrive earlier wait for it (`wait`). Only the graph import is required:
+    the other steps are best effort and their outcome is reported in `stats`.
+    """
+
+    def __init__(self):
+        self.state = "pending"
+        self.graph = None
+        self.error = None
+        self.seconds = None
+        self.steps = {}
+        self.task = None
+        self.done = None
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def start(self):
+        self.state = "warming"
+        self.done = asyncio.Event()
+        self.task = asyncio.create_task(self.run())
+
+    async def _step(self, name, step, required=False):
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(step(), None if required else WARMUP_STEP_TIMEOUT)
+        except Exception as e:
+            self.steps[name] = {"ok": False, "seconds": round(time.perf_counter() - started, 4), "error": f"{type(e).__name__}: {e}"}
+            if required:
+                raise
+            return None
+        self.steps[name] = {"ok": True, "seconds": round(time.perf_counter() - started, 4)}
+        if result is not None:
+            self.steps[name]["result"] = result
+        return result
+
+    async def run(self):
+        started = time.perf_counter()
+        try:
+            await self._step("graph", self._import_graph, required=True)
+            await asyncio.gather(
+                self._step("checkpointer", self._open_checkpointer),
+                self._step("tokenizer", self._load_tokenizer),
+                self._step("templates", self._load_templates),
+                *([self._step("connections", self._open_connections)] if WARMUP_CONNECTIONS else []),
+                *([self._step("llm_ping", self._ping_llm)] if WARMUP_LLM_PING else []),
+            )
+        except Exception as e:
+            self.state = "failed"
+            self.error = f"{type(e).__name__}: {e}"
+        else:
+            self.state = "ready"
+        finally:
+            self.seconds = round(time.perf_counter() - started, 4)
+            self.done.set()
+
+    async def _import_graph(self):
+        # Importing is CPU-bound; in a thread the event loop keeps answering health checks meanwhile
+        module = await asyncio.to_thread(importlib.import_module, "app.agent.graph")
+        await asyncio.to_thread(importlib.import_module, "app.agent.streaming")
+        self.graph = module.app
+
+    async def _open_checkpointer(self):
+        from app.agent.checkpointing import ensure_checkpointer
+        await ensure_checkpointer(self.graph)
+        return type(self.graph.checkpointer).__name__ if self.graph.checkpointer else None
+
+    async def _load_tokenizer(self):
+        from app.agent.ranking import count_tokens
+        # tiktoken may download its encoding file on a fresh machine; better here than inside a request
+        await asyncio.to_thread(count_tokens, "warmup")
+
+    async def _load_templates(self):
+        from app.agent.rendering import TEMPLATES, env
+
+        def compile_all():
+            for template, _, _ in TEMPLATES.values():
+                env.get_template(template)
+        await asyncio.to_thread(compile_all)
+
+    async def _open_connections(self):
+        from app.agent.http_clients import http_clients
+        return await http_clients.warm(timeout=WARMUP_STEP_TIMEOUT)
+
+    async def _ping_llm(self):
+        from app.agent import llm_setup
+        await llm_setup.llm.bind(max_tokens=1).ainvoke("ping")
+
+    async def wait(self):
+        """The compiled travel graph, once warmup is done."""
+        if self.done is None:
+            self.start()
+        await self.done.wait()
+        if self.graph is None:
+            raise RuntimeError(f"Warmup failed: {self.error}")
+        return self.graph
+
+    async def aclose(self):
+        self.state = "stopping"
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+        if self.graph is not None:
+            from app.agent.checkpointing import close_checkpointer
+            await close_checkpointer(self.graph)
+
+    def stats(self):
+        return {"state": self.state, "seconds": self.seconds, "error": self.error, "steps": self.steps}
+
+
+warmup = Warmup()
@@ -0,0 +1,43 @@
+"""
+Micro-benchmark: per-request construction overhead of the expert agents.
+
+Before, every node execution called `create_react_agent(...)` and `llm.with_structured_output(...)`.
+Now they are built once in app.agent.agent and reused. This times both approaches without any
+network calls (nothing is invoked, only constructed).
+
+    python -m benchmarks.agent_construction
+"""
+import os
+import timeit
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from langgraph.prebuilt import create_react_agent
+from app.agent import agent
+from app.agent.llm_setup import llm
+from app.agent.router import Plan, Router
+from app.agent.tools import get_flight_fares, get_hotels_by_area_and_radius, get_places, get_weather
+
+
+def build_per_request():
+    """What one multi-expert request used to construct before doing any work."""
+    llm.with_structured_output(Router)
+    llm.with_structured_output(Plan)
+    for tool in (get_hotels_by_area_and_radius, get_weather, get_places, get_flight_fares):
+        create_react_agent(llm, tools=[tool], prompt="prompt")
+
+
+def reuse_prebuilt():
+    """What a request touches now: the module-level instances."""
+    (agent.supervisor_llm, agent.planner_llm, agent.hotel_react_agent, agent.weather_react_agent,
+     agent.place_react_agent, agent.flight_fares_react_agent)
+
+
+def main(number=50):
+    for name, fn in (("build per request", build_per_request), ("reuse prebuilt", reuse_prebuilt)):
+        seconds = min(timeit.repeat(fn, number=number, repeat=3)) / number
+        print(f"{name:<20} {seconds * 1000:8.3f} ms/request")
+
+
+if __name__ == "__main__":
+    main()
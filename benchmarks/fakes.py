@@ -0,0 +1,186 @@
+"""
+Offline stand-ins for the service's external dependencies, used by the load harness:
+
+- `FixtureTransport`: an httpx.MockTransport replaying the responses in benchmarks/fixtures
+  (recorded from the notebooks) for LocationIQ, Foursquare, OpenWeather, Booking and flight-fare-search.
+- `FakeChatModel`: a chat model with a configurable latency that routes and calls tools the way the
+  real model is prompted to, so the graph takes the same paths without any OpenAI call.
+"""
+import re
+import json
+import time
+import zlib
+import uuid
+import asyncio
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from app.agent.fast_router import INTENT_CUES, extract_params
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def _load(name):
+    with open(FIXTURES / f"{name}.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FixtureTransport(httpx.MockTransport):
+    """Replays recorded upstream responses, adapted to the request (place, bbox, page), after `latency` seconds."""
+
+    def __init__(self, latency=0.0):
+        super().__init__(self.handle)
+        self.latency = latency
+        self.requests = {}
+        self.locationiq = _load("locationiq")
+        self.foursquare = _load("foursquare")
+        self.openweather = _load("openweather")
+        self.booking = _load("booking")["result"]
+        self.flights = _load("flights")
+
+    async def handle(self, request):
+        host = request.url.host
+        self.requests[host] = self.requests.get(host, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        params = request.url.params
+
+        if host.endswith("locationiq.com"):
+            return httpx.Response(200, json=[self._geocode(params["q"])])
+        if host == "places-api.foursquare.com":
+            return httpx.Response(200, json=self.foursquare)
+        if host == "api.openweathermap.org":
+            return httpx.Response(200, json={**self.openweather, "name": params.get("q", self.openweather["name"])})
+        if host == "apidojo-booking-v1.p.rapidapi.com":
+            return httpx.Response(200, json={"result": self._hotels(params["bbox"], int(params.get("offset", 0)))})
+        if host == "flight-fare-search.p.rapidapi.com":
+            search = {**self.flights["searchData"], "from": params.get("from"), "to": params.get("to"), "date": params.get("date")}
+            return httpx.Response(200, json={**self.flights, "searchData": search})
+        return httpx.Response(404, json={"error": f"No fixture for {host}"})
+
+    def _geocode(self, place):
+        # A stable, distinct location per place name, shaped like a recorded LocationIQ result
+        h = zlib.crc32(place.strip().lower().encode())
+        lat, lon = 8 + (h % 2000) / 100, 70 + (h // 2000 % 2000) / 100
+        template = self.locationiq[h % len(self.locationiq)]
+        return {**template, "lat": str(lat), "lon": str(lon), "display_name": place,
+                "boundingbox": [str(lat - 0.06), str(lat + 0.06), str(lon - 0.06), str(lon + 0.06)]}
+
+    def _hotels(self, bbox, offset):
+        # The recorded page, moved into the requested bbox; later pages are shifted copies with distinct ids
+        min_lat, max_lat, min_lon, max_lon = map(float, bbox.split(","))
+        c_lat = sum(h["latitude"] for h in self.booking) / len(self.booking)
+        c_lon = sum(h["longitude"] for h in self.booking) / len(self.booking)
+        page = offset // len(self.booking)
+        d_lat = (min_lat + max_lat) / 2 - c_lat + page * 0.002
+        d_lon = (min_lon + max_lon) / 2 - c_lon + page * 0.002
+        return [{**h, "hotel_id": h["hotel_id"] + page * 10_000_000,
+                 "latitude": h["latitude"] + d_lat, "longitude": h["longitude"] + d_lon} for h in self.booking]
+
+
+def _user_query(messages):
+    """The latest message from the user (expert results are HumanMessages too, but named)."""
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage) and not message.name:
+            return message.content
+    return ""
+
+
+def _intents(query):
+    lowered = query.lower()
+    intents = [intent for intent, cues in INTENT_CUES.items() if any(re.search(cue, lowered) for cue in cues)]
+    if "from_code" in extract_params(query) and "flight_fares_search_expert" not in intents:
+        intents.append("flight_fares_search_expert")
+    return intents
+
+
+def _arguments(query):
+    """Tool arguments per expert, as the real model would fill them from the query."""
+    params = extract_params(query)
+    city = params.get("city", "Bangalore")
+    travel_date = params.get("date", (date.today() + timedelta(days=1)).isoformat())
+    hotel = {"location": city}
+    if "arrival_date" in params:
+        hotel.update(arrival_date=params["arrival_date"], departure_date=params["departure_date"])
+    return {
+        "hotel_search_expert": ("hotel_args", "get_hotels_by_area_and_radius", hotel),
+        "weather_expert": ("weather_args", "get_weather", {"city": city}),
+        "place_search_expert": ("place_args", "get_places", {"city": city, "query": "attractions"}),
+        "flight_fares_search_expert": ("flight_args", "get_flight_fares", {
+            "from_code": params.get("from_code", "BLR"), "to_code": params.get("to_code", "CCU"), "date": travel_date}),
+    }
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic chat model for load tests. Structured-output calls (router / planner) pick experts by
+    keyword; tool-bound calls (expert react agents) call their tool once, then answer. Every call
+    sleeps `latency` seconds and reports approximate token usage, like a real model would.
+    """
+
+    model_name: str = "fake-travel-chat"
+    latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "fake-travel-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def with_structured_output(self, schema, **kwargs):
+        return self.bind(structured=schema.__name__) | RunnableLambda(lambda message: json.loads(message.content))
+
+    def _respond(self, messages, tools=None, structured=None):
+        query = _user_query(messages)
+        arguments = _arguments(query)
+
+        if structured:
+            intents = _intents(query)
+            if structured == "Router":
+                # Experts that already answered this turn (earlier turns of the thread do not count)
+                turn = next(i for i in range(len(messages) - 1, -1, -1)
+                            if isinstance(messages[i], HumanMessage) and not messages[i].name)
+                answered = {m.name for m in messages[turn:] if isinstance(m, HumanMessage) and m.name}
+                pending = [intent for intent in intents if intent not in answered]
+                intents = pending[:1]
+                output = {"next": intents[0] if intents else "FINISH"}
+            else:
+                output = {"experts": intents}
+            for intent in intents:
+                field, _, args = arguments[intent]
+                output[field] = args
+            return AIMessage(content=json.dumps(output))
+
+        if tools and not isinstance(messages[-1], ToolMessage):
+            name = tools[0]["function"]["name"]
+            args = next((args for _, tool, args in arguments.values() if tool == name), {})
+            return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}"}])
+        return AIMessage(content="Here is what I found.")
+
+    def _result(self, messages, tools, structured):
+        self.calls += 1
+        message = self._respond(messages, tools, structured)
+        prompt_tokens = sum(len(str(m.content)) for m in messages) // 4
+        completion_tokens = max(1, (len(message.content) + len(json.dumps(message.tool_calls))) // 4)
+        message.usage_metadata = {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                                  "total_tokens": prompt_tokens + completion_tokens}
+        message.response_metadata = {"model_name": self.model_name}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, structured: Optional[str] = None, **kwargs):
+        time.sleep(self.latency)
+        return self._result(messages, tools, structured)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, structured: Optional[str] = None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._result(messages, tools, structured)
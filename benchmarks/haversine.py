@@ -0,0 +1,49 @@
+"""
+Benchmark: per-hotel `haversine_distance` loop + full sort vs NumPy batch haversine + argpartition top-K,
+and radius queries against the in-memory hotel grid index.
+
+    python -m benchmarks.haversine
+"""
+import random
+import timeit
+
+from app.agent.geo import HotelGridIndex, haversine_many, nearest
+from app.agent.tools import haversine_distance
+
+
+def make_hotels(n, lat=12.97, lon=77.59, spread=0.3, seed=0):
+    rng = random.Random(seed)
+    return [{"hotel_id": i, "latitude": lat + rng.uniform(-spread, spread), "longitude": lon + rng.uniform(-spread, spread)}
+            for i in range(n)]
+
+
+def loop_top_k(hotels, lat, lon, k):
+    distances = [(haversine_distance(lat, lon, h["latitude"], h["longitude"]), h) for h in hotels]
+    distances.sort(key=lambda pair: pair[0])
+    return distances[:k]
+
+
+def numpy_top_k(hotels, lat, lon, k):
+    distances = haversine_many(lat, lon, [h["latitude"] for h in hotels], [h["longitude"] for h in hotels])
+    return [hotels[i] for i in nearest(distances, k)]
+
+
+def main(k=10):
+    lat, lon = 12.97, 77.59
+    for n in (100, 1000, 10000):
+        hotels = make_hotels(n)
+        assert [h["hotel_id"] for _, h in loop_top_k(hotels, lat, lon, k)] == [h["hotel_id"] for h in numpy_top_k(hotels, lat, lon, k)]
+        number = max(1, 20000 // n)
+        loop = min(timeit.repeat(lambda: loop_top_k(hotels, lat, lon, k), number=number, repeat=3)) / number
+        vec = min(timeit.repeat(lambda: numpy_top_k(hotels, lat, lon, k), number=number, repeat=3)) / number
+        print(f"n={n:<6} loop+sort {loop * 1000:8.3f} ms   numpy+argpartition {vec * 1000:8.3f} ms   x{loop / vec:5.1f}")
+
+    index = HotelGridIndex(ttl=3600)
+    hotels = make_hotels(10000)
+    index.add("signature", (lat - 0.3, lat + 0.3, lon - 0.3, lon + 0.3), hotels)
+    query = min(timeit.repeat(lambda: index.within("signature", lat, lon, 3.0, k), number=200, repeat=3)) / 200
+    print(f"grid index, 10000 hotels, 3 km radius query: {query * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
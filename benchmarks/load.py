@@ -0,0 +1,240 @@
+"""
+Offline load test: the whole service with recorded upstream responses and a fake LLM, so it
+costs no OpenAI or RapidAPI quota and gives comparable numbers run to run.
+
+Upstream HTTP calls are answered by `FixtureTransport` and `llm_setup.llm` is replaced by a
+`FakeChatModel` before the graph is imported. Queries of several types (single-intent ones the fast
+router handles, multi-intent ones that go through the LLM planner) are driven either through
+`/start-plan-trip` + `/get-response`, in one `/batch-plan-trip` request, or straight through the
+graph, at a fixed concurrency.
+Reports p50/p95/p99 latency, throughput and LLM / upstream call counts per query type.
+
+    python -m benchmarks.load --requests 200 --concurrency 16 --llm-latency 0.4 --upstream-latency 0.1
+    python -m benchmarks.load --mode graph --warm --json results.json --max-p95 2.0
+    python -m benchmarks.load --mode batch --requests 200 --concurrency 16
+
+Caches are disabled unless --warm, so every request does the full work. Client-side rate limits
+apply as configured (they dominate at high concurrency) unless --no-rate-limit. With --max-p95 the
+exit status is 1 when any query type's p95 exceeds the limit (for CI).
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from datetime import date, timedelta
+
+CITIES = ["Kolkata", "Bangalore", "Goa", "Mumbai", "Chennai", "Jaipur", "Delhi", "Hyderabad"]
+AIRPORTS = ["CCU", "BLR", "GOI", "BOM", "MAA", "JAI", "DEL", "HYD"]
+
+QUERIES = {
+    "weather": "What's the weather in {city} today?",
+    "hotels": "Find 4 star hotels in {city} from {arrival} to {departure}",
+    "places": "Top attractions to visit in {city}",
+    "flights": "Cheapest flights {origin} to {iata} on {arrival}",
+    "multi": "Plan my weekend in {city}: hotels, the weather and things to do",
+}
+
+
+def make_queries(n):
+    arrival = date.today() + timedelta(days=7)
+    queries = []
+    for i in range(n):
+        kind = list(QUERIES)[i % len(QUERIES)]
+        j = (i // len(QUERIES)) % len(CITIES)
+        message = QUERIES[kind].format(city=CITIES[j], iata=AIRPORTS[j], origin=AIRPORTS[j - 1], arrival=arrival.isoformat(),
+                                       departure=(arrival + timedelta(days=2)).isoformat())
+        queries.append((kind, message))
+    return queries
+
+
+def configure(args):
+    """Environment for an offline run; must happen before anything in app/ is imported."""
+    for key in ("OPENAI_API_KEY", "GEOLOCATION_IQ_API_KEY", "FOURSQUARE_API_KEY", "OPENWEATHER_API_KEY",
+                "RAPIDAPI_KEY_HOTELS", "RAPIDAPI_KEY_FLIGHTS"):
+        os.environ.setdefault(key, "benchmark")
+    os.environ["GRAPH_MODE"] = args.graph_mode
+    os.environ.pop("GEOCODE_CACHE_DB", None)
+    os.environ["JOB_STORE"] = "memory"
+    os.environ["JOB_WORKERS"] = str(args.concurrency)
+    os.environ["JOB_QUEUE_SIZE"] = str(args.requests + args.concurrency)
+    os.environ.pop("RATE_LIMIT_DB", None)
+    os.environ["CHECKPOINTER"] = args.checkpointer
+    os.environ["CHECKPOINT_DB"] = ":memory:"
+    if args.no_rate_limit:
+        for upstream in ("LOCATIONIQ", "FOURSQUARE", "OPENWEATHER", "BOOKING", "FLIGHTS"):
+            os.environ[f"RATE_LIMIT_{upstream}"] = "0"
+    if not args.warm:
+        os.environ["RESPONSE_CACHE_ENABLED"] = "0"
+        os.environ["GEOCODE_CACHE_TTL"] = "0"
+        os.environ["GEOCODE_NEGATIVE_TTL"] = "0"
+        for tool in ("GET_PLACES", "GET_HOTELS_BY_AREA_AND_RADIUS", "GET_WEATHER", "GET_FLIGHT_FARES"):
+            os.environ[f"TOOL_CACHE_TTL_{tool}"] = "0"
+            os.environ[f"TOOL_CACHE_STALE_{tool}"] = "0"
+
+    from benchmarks.fakes import FakeChatModel, FixtureTransport
+    from app.agent import llm_setup
+    from app.agent.http_clients import http_clients
+
+    llm_setup.llm = FakeChatModel(latency=args.llm_latency)
+    http_clients.transport = FixtureTransport(latency=args.upstream_latency)
+    return llm_setup.llm, http_clients.transport
+
+
+async def run_graph(queries, concurrency):
+    from app.agent.graph import app as travel_graph
+    from app.agent.streaming import trip_events
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i, message):
+        async with semaphore:
+            started = time.perf_counter()
+            status, timings = "error", None
+            async for event, data in trip_events(travel_graph, message, f"bench-{i}"):
+                if event == "done":
+                    status, timings = "done", data["timings"]
+            return time.perf_counter() - started, status, timings
+
+    return await asyncio.gather(*(one(i, message) for i, (_, message) in enumerate(queries)))
+
+
+async def run_http(queries, concurrency, poll_interval):
+    import httpx
+    from app.main import app
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(client, message):
+        async with semaphore:
+            started = time.perf_counter()
+            res = await client.post("/start-plan-trip", json={"message": message}, headers={"X-Client-Id": "bench"})
+            if res.status_code != 200:
+                return time.perf_counter() - started, f"http_{res.status_code}", None
+            job_id = res.json()["job_id"]
+            while True:
+                await asyncio.sleep(poll_interval)
+                job = (await client.get(f"/get-response/{job_id}")).json()
+                if job["status"] not in ("queued", "processing"):
+                    return time.perf_counter() - started, job["status"], job.get("timings")
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+            return await asyncio.gather(*(one(client, message) for _, message in queries))
+
+
+async def run_batch(queries, concurrency):
+    import httpx
+    from app.main import app
+
+    results, summary = [None] * len(queries), None
+    body = {"queries": [{"message": message} for _, message in queries], "parallelism": concurrency}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=None) as client:
+            async with client.stream("POST", "/batch-plan-trip", json=body) as res:
+                async for line in res.aiter_lines():
+                    if not line:
+                        continue
+                    item = json.loads(line)
+                    if item["type"] == "summary":
+                        summary = item
+                        continue
+                    # Copies of a query planned once made no calls of their own
+                    n = 0 if item["deduplicated"] else 1
+                    timings = {"llm_calls": [None] * item["llm_calls"] * n, "http_calls": [None] * item["upstream_calls"] * n,
+                               "prompt_tokens": item["tokens"] * n, "completion_tokens": 0}
+                    results[item["index"]] = (item["seconds"] + item["queued_seconds"], item["status"], timings)
+    return results, summary
+
+
+def report(queries, results, wall_seconds):
+    from app.agent.telemetry import percentile
+
+    by_kind = {}
+    for (kind, _), (seconds, status, timings) in zip(queries, results):
+        entry = by_kind.setdefault(kind, {"latencies": [], "errors": 0, "llm_calls": 0, "tokens": 0, "http_calls": 0})
+        entry["latencies"].append(seconds)
+        if status != "done":
+            entry["errors"] += 1
+        if timings:
+            entry["llm_calls"] += len(timings["llm_calls"])
+            entry["tokens"] += timings["prompt_tokens"] + timings["completion_tokens"]
+            entry["http_calls"] += len(timings["http_calls"])
+
+    summary = {"requests": len(results), "wall_seconds": round(wall_seconds, 3),
+               "throughput_rps": round(len(results) / wall_seconds, 2), "types": {}}
+    for kind, entry in by_kind.items():
+        n = len(entry["latencies"])
+        summary["types"][kind] = {
+            "requests": n,
+            "errors": entry["errors"],
+            "p50": round(percentile(entry["latencies"], 50), 4),
+            "p95": round(percentile(entry["latencies"], 95), 4),
+            "p99": round(percentile(entry["latencies"], 99), 4),
+            "llm_calls_per_request": round(entry["llm_calls"] / n, 2),
+            "tokens_per_request": round(entry["tokens"] / n, 1),
+            "upstream_calls_per_request": round(entry["http_calls"] / n, 2),
+        }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", choices=("http", "graph", "batch"), default="http")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds per fake LLM call")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="seconds per upstream HTTP call")
+    parser.add_argument("--graph-mode", choices=("plan", "serial"), default=os.getenv("GRAPH_MODE", "plan"))
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--checkpointer", choices=("sqlite", "memory", "none"), default="memory",
+                        help="conversation checkpoints (sqlite uses an in-memory database)")
+    parser.add_argument("--warm", action="store_true", help="keep the response/tool/geocode caches enabled")
+    parser.add_argument("--no-rate-limit", action="store_true", help="disable the client-side upstream rate limits")
+    parser.add_argument("--json", help="also write the summary to this file")
+    parser.add_argument("--max-p95", type=float, help="exit 1 if any query type's p95 exceeds this many seconds")
+    args = parser.parse_args(argv)
+
+    model, transport = configure(args)
+    queries = make_queries(args.requests)
+
+    started = time.perf_counter()
+    batch = None
+    if args.mode == "graph":
+        results = asyncio.run(run_graph(queries, args.concurrency))
+    elif args.mode == "batch":
+        results, batch = asyncio.run(run_batch(queries, args.concurrency))
+    else:
+        results = asyncio.run(run_http(queries, args.concurrency, args.poll_interval))
+    summary = report(queries, results, time.perf_counter() - started)
+    summary["llm_calls"] = model.calls
+    summary["upstream_requests"] = transport.requests
+    if batch:
+        summary["batch"] = batch
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, mode {args.mode}/{args.graph_mode}: "
+          f"{summary['throughput_rps']} req/s, {model.calls} LLM calls")
+    print(f"{'type':<10}{'n':>5}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'llm/req':>9}{'tok/req':>9}{'http/req':>10}")
+    for kind, row in summary["types"].items():
+        print(f"{kind:<10}{row['requests']:>5}{row['errors']:>5}{row['p50']:>9.3f}{row['p95']:>9.3f}{row['p99']:>9.3f}"
+              f"{row['llm_calls_per_request']:>9.2f}{row['tokens_per_request']:>9.0f}{row['upstream_calls_per_request']:>10.2f}")
+    if batch:
+        print(f"batch: {batch['items']} items, {batch['planned']} planned, {batch['throughput_per_second']} items/s, "
+              f"p50 {batch['latency_seconds']['p50']}s p95 {batch['latency_seconds']['p95']}s, "
+              f"shared calls {batch['shared_calls']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    if args.max_p95 is not None:
+        slow = [kind for kind, row in summary["types"].items() if row["p95"] > args.max_p95]
+        if slow:
+            print(f"p95 above {args.max_p95}s for: {', '.join(slow)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Startup profile of the API process: where `import app.main` spends its time, and how long the
+lifespan warmup takes until /readyz reports ready, step by step.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --top 25 --connections --json startup.json
+
+Each measurement runs in a fresh interpreter, so nothing is already imported. API keys are dummies
+and the checkpointer is in memory; upstream connections are only opened with --connections (needs
+network) and no LLM is called.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+from collections import defaultdict
+
+
+def child_env(args):
+    env = {**os.environ, "CHECKPOINTER": "memory", "WARMUP_LLM_PING": "0",
+           "WARMUP_CONNECTIONS": "1" if args.connections else "0"}
+    for key in ("OPENAI_API_KEY", "GEOLOCATION_IQ_API_KEY", "FOURSQUARE_API_KEY", "OPENWEATHER_API_KEY",
+                "RAPIDAPI_KEY_HOTELS", "RAPIDAPI_KEY_FLIGHTS"):
+        env.setdefault(key, "benchmark")
+    return env
+
+
+def import_profile(args):
+    """Self time per top-level package from `python -X importtime` (microseconds -> seconds)."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                            capture_output=True, text=True, env=child_env(args), check=True)
+    packages = defaultdict(float)
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        packages[name.split(".")[0]] += int(self_us) / 1e6
+        if name == "app.main":
+            total = int(cumulative_us) / 1e6
+    top = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    return {"import_seconds": round(total, 4), "packages": {name: round(seconds, 4) for name, seconds in top}}
+
+
+def measure_warmup():
+    """Run in the child: import app.main, then its lifespan until warmup is done."""
+    started = time.perf_counter()
+    from app.main import app
+    from app.warmup import warmup
+    imported = time.perf_counter()
+
+    async def run():
+        async with app.router.lifespan_context(app):
+            await warmup.wait()
+            return time.perf_counter(), warmup.stats()
+
+    ready, stats = asyncio.run(run())
+    print(json.dumps({"import_seconds": round(imported - started, 4), "ready_seconds": round(ready - started, 4),
+                      "warmup": stats}))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--top", type=int, default=15, help="packages to list by import time")
+    parser.add_argument("--connections", action="store_true", help="open the upstream connections during warmup")
+    parser.add_argument("--json", help="also write the profile to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        measure_warmup()
+        return 0
+
+    profile = import_profile(args)
+    child = subprocess.run([sys.executable, "-m", "benchmarks.startup", "--child"],
+                           capture_output=True, text=True, env=child_env(args), check=True)
+    profile.update({f"lifespan_{k}" if k == "import_seconds" else k: v
+                    for k, v in json.loads(child.stdout.strip().splitlines()[-1]).items()})
+
+    print(f"import app.main: {profile['import_seconds']:.3f}s (self time by package below)")
+    for name, seconds in profile["packages"].items():
+        print(f"  {name:<24}{seconds:>8.3f}s")
+    print(f"ready after {profile['ready_seconds']:.3f}s (import {profile['lifespan_import_seconds']:.3f}s, "
+          f"warmup {profile['warmup']['seconds']:.3f}s, {profile['warmup']['state']})")
+    for name, step in profile["warmup"]["steps"].items():
+        outcome = step.get("result", "ok") if step["ok"] else step["error"]
+        print(f"  {name:<24}{step['seconds']:>8.3f}s  {outcome}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(profile, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
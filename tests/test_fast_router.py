@@ -0,0 +1,29 @@
+import pytest
+from app.agent.fast_router import classify, has_constraints
+
+
+@pytest.mark.parametrize("message", [
+    "hotels in Paris on Friday",
+    "hotels in Goa next weekend",
+    "hotels in Goa in December",
+    "hotels in Goa on 5 November",
+    "hotels in Goa day after tomorrow",
+    "4 star hotels in Goa tomorrow",
+    "weather in Paris and London",
+    "hotels in Goa and Mumbai",
+    "weather in Paris, London and Rome",
+])
+def test_queries_with_unread_constraints_go_to_the_react_agent(message):
+    expert, params = classify(message)
+    assert has_constraints(expert, message, params)
+
+
+@pytest.mark.parametrize("message", [
+    "hotels in Goa tomorrow",
+    "weather in Kolkata, India",
+    "BLR to CCU on 2026-11-02",
+    "Find hotels in Mumbai from 2026-10-24 to 2026-10-26",
+])
+def test_fully_read_queries_get_direct_args(message):
+    expert, params = classify(message)
+    assert not has_constraints(expert, message, params)
@@ -0,0 +1,22 @@
+import asyncio
+import httpx
+from app.agent import geocoding
+from app.agent.geocoding import Geocoder
+from app.agent.tool_cache import SharedCalls, shared_calls
+
+
+def test_upstream_failure_is_not_shared_within_a_batch(monkeypatch):
+    responses = [httpx.Response(503), httpx.Response(200, json=[{"lat": "15.3", "lon": "74.1"}])]
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: responses.pop(0)))
+    monkeypatch.setattr(geocoding, "GAZETTEER_ENABLED", False)
+    monkeypatch.setattr(geocoding.http_clients, "get", lambda name: client)
+
+    async def main():
+        shared_calls.set(SharedCalls())
+        geocoder = Geocoder()
+        assert await geocoder.search("Atlantis") is None
+        # The outage was not remembered as "not found": the next lookup in the batch asks again
+        assert await geocoder.coordinates("Atlantis") == (15.3, 74.1)
+        assert geocoder.counters["upstream_errors"] == 1 and geocoder.counters["misses"] == 2
+        await client.aclose()
+    asyncio.run(main())
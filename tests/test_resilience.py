@@ -0,0 +1,245 @@
+import time
+import asyncio
+import httpx
+import pytest
+from app.agent.rate_limit import MemoryBucketStore, RateLimiter, SQLiteBucketStore
+from app.agent.resilience import (CircuitBreaker, CircuitOpen, DeadlineExceeded, ResilientTransport,
+                                  hedged, job_deadline)
+
+
+class Upstream:
+    """MockTransport handler answering from a list of responses (or exceptions), counting calls."""
+
+    def __init__(self, *outcomes, delay=0.0):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, request):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def client(upstream, **kwargs):
+    kwargs = {"retries": 0, "backoff_base": 0.0, **kwargs}
+    return httpx.AsyncClient(transport=ResilientTransport("test", httpx.MockTransport(upstream), **kwargs))
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    async def main():
+        upstream = Upstream(httpx.Response(503))
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_after=60)
+        async with client(upstream, breaker=breaker) as c:
+            assert (await c.get("https://upstream/")).status_code == 503
+            assert (await c.get("https://upstream/")).status_code == 503
+            assert breaker.state == "open"
+            with pytest.raises(CircuitOpen):
+                await c.get("https://upstream/")
+        # Rejected without calling the upstream
+        assert upstream.calls == 2
+        assert breaker.counters == {"opened": 1, "rejected": 1}
+    run(main())
+
+
+def test_breaker_ignores_4xx_and_resets_on_success():
+    async def main():
+        upstream = Upstream(httpx.Response(503), httpx.Response(404), httpx.Response(503), httpx.Response(200))
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_after=60)
+        async with client(upstream, breaker=breaker) as c:
+            for _ in range(4):
+                await c.get("https://upstream/")
+        assert breaker.state == "closed" and breaker.failures == 0
+    run(main())
+
+
+def test_half_open_lets_one_probe_through_and_reopens_on_failure():
+    async def main():
+        upstream = Upstream(httpx.Response(503), delay=0.05)
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_after=0.05)
+        async with client(upstream, breaker=breaker) as c:
+            await c.get("https://upstream/")
+            assert breaker.state == "open"
+            await asyncio.sleep(0.06)
+            # Two concurrent calls: one probes, the other is rejected while the probe is in flight
+            results = await asyncio.gather(c.get("https://upstream/"), c.get("https://upstream/"), return_exceptions=True)
+        assert sorted(type(r).__name__ for r in results) == ["CircuitOpen", "Response"]
+        assert upstream.calls == 2
+        assert breaker.state == "open" and breaker.counters["opened"] == 2
+    run(main())
+
+
+def test_half_open_probe_success_closes_breaker():
+    async def main():
+        upstream = Upstream(httpx.Response(503), httpx.Response(200))
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_after=0.05)
+        async with client(upstream, breaker=breaker) as c:
+            await c.get("https://upstream/")
+            with pytest.raises(CircuitOpen):
+                await c.get("https://upstream/")
+            await asyncio.sleep(0.06)
+            assert (await c.get("https://upstream/")).status_code == 200
+            assert breaker.state == "closed"
+            assert (await c.get("https://upstream/")).status_code == 200
+    run(main())
+
+
+def test_cancelled_probe_does_not_block_the_next_one():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_after=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_retry_after_longer_than_cap_returns_at_once():
+    async def main():
+        upstream = Upstream(httpx.Response(429, headers={"Retry-After": "60"}), httpx.Response(200))
+        async with client(upstream, retries=2, max_retry_after=1.0) as c:
+            started = time.perf_counter()
+            response = await c.get("https://upstream/")
+        assert response.status_code == 429
+        assert upstream.calls == 1
+        assert time.perf_counter() - started < 0.5
+    run(main())
+
+
+def test_retry_after_within_cap_is_waited_for():
+    async def main():
+        upstream = Upstream(httpx.Response(503, headers={"Retry-After": "0.2"}), httpx.Response(200))
+        async with client(upstream, retries=2, max_retry_after=1.0) as c:
+            started = time.perf_counter()
+            response = await c.get("https://upstream/")
+        assert response.status_code == 200
+        assert upstream.calls == 2
+        assert time.perf_counter() - started >= 0.2
+    run(main())
+
+
+def test_deadline_shorter_than_retry_after_returns_last_response():
+    async def main():
+        job_deadline.set(asyncio.get_running_loop().time() + 0.2)
+        upstream = Upstream(httpx.Response(503, headers={"Retry-After": "5"}), httpx.Response(200))
+        async with client(upstream, retries=2, max_retry_after=10.0) as c:
+            started = time.perf_counter()
+            response = await c.get("https://upstream/")
+        assert response.status_code == 503
+        assert upstream.calls == 1
+        assert time.perf_counter() - started < 0.2
+    run(main())
+
+
+def test_deadline_shorter_than_backoff_raises_without_sleeping():
+    async def main():
+        job_deadline.set(asyncio.get_running_loop().time() + 0.2)
+        upstream = Upstream(httpx.ConnectError("refused"))
+        transport = ResilientTransport("test", httpx.MockTransport(upstream), retries=3)
+        transport._backoff = lambda attempt: 1.0
+        async with httpx.AsyncClient(transport=transport) as c:
+            started = time.perf_counter()
+            with pytest.raises(DeadlineExceeded):
+                await c.get("https://upstream/")
+        assert upstream.calls == 1
+        assert time.perf_counter() - started < 0.2
+        assert transport.counters["deadline_exceeded"] == 1
+    run(main())
+
+
+def test_attempt_is_cut_to_the_deadline_without_blaming_the_upstream():
+    async def main():
+        job_deadline.set(asyncio.get_running_loop().time() + 0.1)
+        upstream = Upstream(httpx.Response(200), delay=1.0)
+        breaker = CircuitBreaker("test", failure_threshold=1)
+        async with client(upstream, breaker=breaker, timeout=5.0) as c:
+            with pytest.raises(httpx.TimeoutException):
+                await c.get("https://upstream/")
+        assert breaker.state == "closed"
+    run(main())
+
+
+def test_rate_limit_wait_over_max_wait_refunds_the_token():
+    async def main():
+        store = MemoryBucketStore()
+        limiter = RateLimiter(store)
+        assert await limiter.acquire("test:key", rate=1.0, burst=1) == 0.0
+        assert await limiter.acquire("test:key", rate=1.0, burst=1, max_wait=0.1) is None
+        # The refused call took no token: the bucket is as the first call left it
+        tokens, _ = store.buckets["test:key"]
+        assert tokens == pytest.approx(0.0, abs=0.01)
+        assert limiter.counters["test:key"]["acquired"] == 1
+    run(main())
+
+
+def test_sqlite_bucket_refund(tmp_path):
+    async def main():
+        limiter = RateLimiter(SQLiteBucketStore(str(tmp_path / "buckets.db")))
+        assert await limiter.acquire("test:key", rate=20.0, burst=1) == 0.0
+        assert await limiter.acquire("test:key", rate=20.0, burst=1, max_wait=0.0) is None
+        waited = await limiter.acquire("test:key", rate=20.0, burst=1)
+        # Only one reservation ahead of it (the refused one was given back): at most 1/20 s
+        assert 0.0 <= waited <= 0.05
+    run(main())
+
+
+def test_rate_limit_wait_past_deadline_raises_and_refunds():
+    async def main():
+        store = MemoryBucketStore()
+        upstream = Upstream(httpx.Response(200))
+        transport = ResilientTransport("test", httpx.MockTransport(upstream), limiter=RateLimiter(store), rate=1.0, burst=1)
+        async with httpx.AsyncClient(transport=transport) as c:
+            await c.get("https://upstream/")
+            job_deadline.set(asyncio.get_running_loop().time() + 0.1)
+            with pytest.raises(DeadlineExceeded):
+                await c.get("https://upstream/")
+        assert upstream.calls == 1
+        (tokens, _), = store.buckets.values()
+        assert tokens == pytest.approx(0.0, abs=0.01)
+    run(main())
+
+
+def test_hedged_returns_the_first_acceptable_result_and_cancels_the_rest():
+    async def main():
+        started, cancelled = [], []
+
+        async def call():
+            n = len(started)
+            started.append(n)
+            try:
+                await asyncio.sleep(1.0 if n == 0 else 0.01)
+            except asyncio.CancelledError:
+                cancelled.append(n)
+                raise
+            return n
+
+        assert await hedged(call, delay=0.05, hedges=1) == 1
+        await asyncio.sleep(0)
+        assert started == [0, 1] and cancelled == [0]
+    run(main())
+
+
+def test_hedged_raises_when_every_copy_fails():
+    async def main():
+        async def call():
+            raise httpx.ConnectError("refused")
+
+        with pytest.raises(httpx.ConnectError):
+            await hedged(call, delay=0.01, hedges=2)
+    run(main())
+
+
+def test_hedged_falls_back_to_an_unaccepted_result():
+    async def main():
+        async def call():
+            return []
+
+        assert await hedged(call, delay=0.01, hedges=1, accept=bool) == []
+    run(main())
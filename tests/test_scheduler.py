@@ -0,0 +1,138 @@
+import asyncio
+import pytest
+from app.scheduler import JobScheduler, QueueFull
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def started_scheduler(**kwargs):
+    scheduler = JobScheduler(**{"workers": 1, "max_queue": 10, "abandon_after": 0, **kwargs})
+    await scheduler.start()
+    return scheduler
+
+
+def test_stop_while_a_job_runs():
+    async def main():
+        scheduler = await started_scheduler()
+        running = asyncio.Event()
+
+        async def job():
+            running.set()
+            await asyncio.sleep(100)
+
+        await scheduler.submit("job", "client", job)
+        await running.wait()
+        await asyncio.wait_for(scheduler.stop(), 2)
+        assert scheduler.tasks == []
+    run(main())
+
+
+def test_cancelled_job_does_not_stop_its_worker():
+    async def main():
+        scheduler = await started_scheduler()
+        running, done = asyncio.Event(), []
+
+        async def slow():
+            running.set()
+            await asyncio.sleep(100)
+
+        async def fast():
+            done.append("fast")
+
+        await scheduler.submit("slow", "client", slow)
+        await scheduler.submit("fast", "client", fast)
+        await running.wait()
+        await scheduler.cancel("slow")
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert done == ["fast"]
+        assert scheduler.counters["cancelled"] == 1 and scheduler.counters["completed"] == 1
+        await asyncio.wait_for(scheduler.stop(), 2)
+    run(main())
+
+
+def test_cancel_queued_job_and_finished_job():
+    async def main():
+        scheduler = await started_scheduler()
+        release, ran = asyncio.Event(), []
+
+        async def blocker():
+            await release.wait()
+
+        async def queued():
+            ran.append("queued")
+
+        await scheduler.submit("blocker", "a", blocker)
+        await scheduler.submit("queued", "a", queued)
+        await asyncio.sleep(0)
+        await scheduler.cancel("queued")
+        assert scheduler.position("queued") is None
+        release.set()
+        for _ in range(10):
+            await asyncio.sleep(0)
+        # Cancelling a job that already finished is a no-op
+        await scheduler.cancel("blocker")
+        assert ran == [] and scheduler.counters["cancelled"] == 1
+        await scheduler.stop()
+    run(main())
+
+
+def test_queue_full():
+    async def main():
+        scheduler = JobScheduler(workers=1, max_queue=1, abandon_after=0)
+
+        async def job():
+            pass
+
+        assert scheduler.has_room(1) and not scheduler.has_room(2)
+        await scheduler.submit("a", "client", job)
+        assert not scheduler.has_room(1)
+        with pytest.raises(QueueFull):
+            await scheduler.submit("b", "client", job)
+        assert scheduler.counters["rejected"] == 1
+    run(main())
+
+
+def test_round_robin_across_clients():
+    async def main():
+        scheduler = JobScheduler(workers=1, max_queue=10, abandon_after=0)
+        order = []
+
+        def job(name):
+            async def fn():
+                order.append(name)
+            return fn
+
+        for name in ("a1", "a2", "a3"):
+            await scheduler.submit(name, "a", job(name))
+        await scheduler.submit("b1", "b", job("b1"))
+        assert scheduler.position("b1") == 2
+        await scheduler.start()
+        for _ in range(20):
+            await asyncio.sleep(0)
+        assert order == ["a1", "b1", "a2", "a3"]
+        await scheduler.stop()
+    run(main())
+
+
+def test_reaper_cancels_jobs_nobody_polls():
+    async def main():
+        cancelled = []
+
+        async def on_cancel(job_id):
+            cancelled.append(job_id)
+
+        scheduler = await started_scheduler(abandon_after=0.05, on_cancel=on_cancel)
+
+        async def job():
+            await asyncio.sleep(100)
+
+        await scheduler.submit("running", "a", job)
+        await scheduler.submit("queued", "a", job)
+        await asyncio.sleep(0.2)
+        assert sorted(cancelled) == ["queued", "running"]
+        assert scheduler.stats()["running"] == 0 and scheduler.queued == 0
+        await asyncio.wait_for(scheduler.stop(), 2)
+    run(main())